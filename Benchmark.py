@@ -0,0 +1,297 @@
+import importlib.util
+import inspect
+import random
+import sys
+import time
+import tracemalloc
+
+"""
+Load a PokerGame module from a file path, so that an older copy of the engine
+Can be benchmarked side by side with the current one
+"""
+def load_engine(path):
+    spec = importlib.util.spec_from_file_location(f"engine_{abs(hash(path))}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def make_game(engine, seats, **options):
+    """_summary_
+    Construct an engine's PokerGame, whether or not its constructor takes the number of seats
+    Engines older than configurable seats are built with their default seats, then cut down to seats
+    Args:
+        engine (module): Module containing PokerGame
+        seats (int): Number of seats at the table
+        options: keyword arguments for the constructor, like seed or variant, left out when None or when the engine doesn't take them
+
+    Returns:
+        PokerGame: the game
+    """
+    parameters = inspect.signature(engine.PokerGame.__init__).parameters
+    options = {name: value for name, value in options.items() if value is not None and name in parameters}
+    if "seats" in parameters:
+        return engine.PokerGame(seats, **options)
+    game = engine.PokerGame(**options)
+    if seats > game.seats:
+        raise ValueError(f"The engine's tables have only {game.seats} seats, {seats} were asked for")
+    game.seats = seats
+    return game
+
+def acting_seat(game):
+    # Engines older than seat bitmasks keep the acting seat at the front of action_permissions
+    if hasattr(game, "acting_seat"):
+        return game.acting_seat
+    return game.action_permissions[0]
+
+def new_game(engine, players, stack, seed=None):
+    # Tables have the default 6 seats unless more players are seated, and engines older than seeded shuffling take no seed
+    seats = max(players, 6)
+    game = make_game(engine, seats, seed=seed)
+    for seat in range(players):
+        game.buyin(seat, stack)
+        game.sitin(seat)
+    return game
+
+"""
+Take one random legal action for the acting player
+"""
+def random_action(game, rng):
+    roll = rng.random()
+    if game.may_check():
+        if roll < 0.7 or not game.may_bet():
+            game.check()
+        else:
+            game.bet(game.current_bet + game.previous_raise)
+    elif roll < 0.3:
+        game.fold()
+    elif roll < 0.9 or not game.may_bet():
+        game.call()
+    else:
+        game.bet(game.current_bet + game.previous_raise)
+
+def play_hand(game, rng):
+    actions = 0
+    game.deal()
+    while game.hand_running():
+        random_action(game, rng)
+        actions += 1
+    return actions
+
+def reset_stacks(game, stack):
+    for seat in game.occupied_seats:
+        game.stacks[seat] = stack
+        if seat not in game.active_seats:
+            game.sitin(seat)
+
+def bench_engine(engine, hands=20000, players=6, stack=200, seed=0):
+    """_summary_
+    Play random hands through an engine and time them
+    Args:
+        engine (module): Module containing PokerGame
+        hands (int): Number of hands to play
+        players (int): Number of players seated
+        stack (int): Starting stack of each player, restored whenever a player busts
+
+    Returns:
+        dict: hands/sec, actions/sec and peak bytes allocated per hand
+    """
+    random.seed(seed)
+    rng = random.Random(seed)
+    game = new_game(engine, players, stack)
+    actions = 0
+    start = time.perf_counter()
+    for hand in range(hands):
+        if len(game.active_seats) < players:
+            reset_stacks(game, stack)
+        actions += play_hand(game, rng)
+    elapsed = time.perf_counter() - start
+
+    # Allocations are measured on a separate, shorter run since tracing slows everything down
+    tracemalloc.start()
+    sample_hands = min(hands, 2000)
+    peak_total = 0
+    for hand in range(sample_hands):
+        if len(game.active_seats) < players:
+            reset_stacks(game, stack)
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        play_hand(game, rng)
+        peak_total += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return {
+        "hands/sec": hands / elapsed,
+        "actions/sec": actions / elapsed,
+        "peak bytes/hand": peak_total / sample_hands
+    }
+
+def bench_deal(engine, deals=20000, players=6, stack=200, seed=0):
+    """_summary_
+    Time deal() on its own, restoring the stacks between deals so the blinds never bust anyone
+    Args:
+        engine (module): Module containing PokerGame
+        deals (int): Number of deals to time
+        players (int): Number of players seated
+
+    Returns:
+        dict: mean and 99th percentile deal latency, and peak bytes allocated per deal
+    """
+    random.seed(seed)
+    game = new_game(engine, players, stack)
+    latencies = []
+    for deal in range(deals):
+        for seat in range(players):
+            game.stacks[seat] = stack
+        start = time.perf_counter()
+        game.deal()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    tracemalloc.start()
+    sample_deals = min(deals, 2000)
+    peak_total = 0
+    for deal in range(sample_deals):
+        for seat in range(players):
+            game.stacks[seat] = stack
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        game.deal()
+        peak_total += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return {
+        "deal mean ns": sum(latencies) / deals * 1e9,
+        "deal p99 ns": latencies[int(deals * 0.99)] * 1e9,
+        "peak bytes/deal": peak_total / sample_deals
+    }
+
+def bench_showdown(showdowns=2000, players=6, seed=0):
+    """_summary_
+    Time scoring every hand at a showdown with each variant's evaluator, against treys over every 5 card combination
+    Omaha hands are also scored by Equity's numpy evaluator, which is built for many runouts at once so pays its overhead on every board here
+    Args:
+        showdowns (int): Number of random deals to score
+        players (int): Number of hands at each showdown
+
+    Returns:
+        dict: mean ns per showdown for each evaluator
+    """
+    import numpy as np
+    from itertools import combinations
+    from treys import Card, Evaluator
+    from HandEvaluator import evaluate_hands, evaluate_short_deck_hands, evaluate_omaha_hands
+    from Equity import card_index, score_omaha_runouts
+    rng = random.Random(seed)
+    deck = [Card.new(rank + suit) for rank in Card.STR_RANKS for suit in "shdc"]
+    short_deck = [card for card in deck if Card.get_rank_int(card) >= 4]
+    deals = [rng.sample(deck, 4 * players + 5) for showdown in range(showdowns)]
+    omaha = [([tuple(deal[4 * seat:4 * seat + 4]) for seat in range(players)], deal[-5:]) for deal in deals]
+    holdem = [([tuple(deal[2 * seat:2 * seat + 2]) for seat in range(players)], deal[-5:]) for deal in deals]
+    short_deals = [rng.sample(short_deck, 2 * players + 5) for showdown in range(showdowns)]
+    short = [([tuple(deal[2 * seat:2 * seat + 2]) for seat in range(players)], deal[-5:]) for deal in short_deals]
+    evaluator = Evaluator()
+    def treys_omaha(hands, board):
+        return [min(evaluator.evaluate(list(pair), list(triple)) for pair in combinations(hand, 2) for triple in combinations(board, 3)) for hand in hands]
+    def numpy_omaha(deals):
+        # Cards are converted to indices up front, then each showdown is scored as a batch of one board
+        hole_indices = np.array([[[card_index(card) for card in hand] for hand in hands] for hands, board in deals])
+        boards = np.array([[card_index(card) for card in board] for hands, board in deals])
+        return [score_omaha_runouts(hole_indices[ind], boards[ind:ind + 1]) for ind in range(len(deals))]
+
+    results = {}
+    for name, evaluate, deals in (("holdem", evaluate_hands, holdem), ("short deck", evaluate_short_deck_hands, short), ("omaha lookup", evaluate_omaha_hands, omaha), ("omaha treys", treys_omaha, omaha)):
+        evaluate(*deals[0])
+        start = time.perf_counter()
+        for hands, board in deals:
+            evaluate(hands, board)
+        results[f"{name} ns/showdown"] = (time.perf_counter() - start) / showdowns * 1e9
+    start = time.perf_counter()
+    numpy_omaha(omaha)
+    results["omaha numpy ns/showdown"] = (time.perf_counter() - start) / showdowns * 1e9
+    return results
+
+class SlowDataManager:
+    """
+    Stands in for DataManager with a fixed delay on every call, like a slow round trip to the database
+    """
+    def __init__(self, latency, pool_size=16):
+        self.latency = latency
+        self.pool_size = pool_size
+
+    def get_chips(self, userID):
+        time.sleep(self.latency)
+        return 0
+
+def bench_event_loop_lag(latency, commands=100, spacing=0.01, interval=0.005, awaited=True):
+    """_summary_
+    Measure how late the event loop runs while commands which each make one database call arrive every spacing seconds
+    Args:
+        latency (float): seconds each database call takes
+        commands (int): number of commands
+        awaited (bool): whether commands await an AsyncDataManager, rather than calling the DataManager directly
+
+    Returns:
+        dict: mean and max ms the loop woke up later than asked, and ms for all the commands to finish
+    """
+    import asyncio
+    from DataManager import AsyncDataManager
+    slow = SlowDataManager(latency)
+    manager = AsyncDataManager(slow) if awaited else None
+
+    async def command(userID):
+        if awaited:
+            await manager.get_chips(userID)
+        else:
+            slow.get_chips(userID)
+
+    async def run():
+        lags = []
+        done = False
+        async def ticker():
+            while not done:
+                start = time.perf_counter()
+                await asyncio.sleep(interval)
+                lags.append(time.perf_counter() - start - interval)
+        ticks = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        tasks = []
+        for userID in range(commands):
+            tasks.append(asyncio.create_task(command(userID)))
+            await asyncio.sleep(spacing)
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+        done = True
+        await ticks
+        return lags, elapsed
+
+    lags, elapsed = asyncio.run(run())
+    if manager is not None:
+        manager.executor.shutdown()
+    return {
+        "mean lag ms": sum(lags) / len(lags) * 1e3,
+        "max lag ms": max(lags) * 1e3,
+        "total ms": elapsed * 1e3
+    }
+
+def print_results(label, results):
+    print(label)
+    for name, value in results.items():
+        print(f"    {name}: {value:,.0f}")
+
+if __name__ == '__main__':
+    # Usage: python Benchmark.py [path/to/other/PokerGame.py], or python Benchmark.py lag
+    if sys.argv[1:] == ["lag"]:
+        # Event loop lag with database latency injected, calling DataManager directly and awaiting AsyncDataManager
+        for latency in (0, 0.02, 0.1, 0.3):
+            for awaited in (False, True):
+                label = f"{latency * 1000:.0f} ms database latency, {'awaited' if awaited else 'blocking'}"
+                print_results(label, bench_event_loop_lag(latency, commands=50, awaited=awaited))
+        sys.exit()
+    engines = [("PokerGame.py", load_engine("PokerGame.py"))]
+    for path in sys.argv[1:]:
+        engines.append((path, load_engine(path)))
+    for label, engine in engines:
+        print_results(label, bench_engine(engine) | bench_deal(engine))
+        try:
+            print_results(f"{label}, 9 players", bench_engine(engine, players=9) | bench_deal(engine, players=9))
+        except ValueError as exception:
+            print(f"{label}, 9 players skipped: {exception}")
+    print_results("Showdown evaluators, 6 players", bench_showdown())
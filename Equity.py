@@ -0,0 +1,361 @@
+import numpy as np
+from itertools import combinations, chain
+from math import comb
+from concurrent.futures import ProcessPoolExecutor
+from treys import Card
+from HandEvaluator import lookup_tables
+
+"""
+Vectorized equity estimation with numpy
+
+Cards are handled as indices 0-51, where index = rank * 4 + suit, so that whole batches of
+Runouts can be dealt and scored as arrays. Scores are the same treys scores as HandEvaluator,
+Looked up from numpy copies of its tables.
+"""
+
+SUIT_BITS = [0x1000, 0x2000, 0x4000, 0x8000]
+CARD_RANKS = np.arange(52) // 4
+CARD_SUITS = np.arange(52) % 4
+CARD_PRIMES = np.array(Card.PRIMES, dtype=np.int64)[CARD_RANKS]
+CARD_RANKBITS = (1 << CARD_RANKS).astype(np.int64)
+POPCOUNT = np.array([mask.bit_count() for mask in range(1 << 13)], dtype=np.int8)
+
+# Numpy copies of the HandEvaluator tables, built on first use
+_flush_scores = None
+_unsuited_keys = None
+_unsuited_scores = None
+
+def numpy_tables():
+    global _flush_scores, _unsuited_keys, _unsuited_scores
+    if _flush_scores is None:
+        flush_table, unsuited_table = lookup_tables()
+        _flush_scores = np.array(flush_table, dtype=np.int32)
+        keys = np.array(sorted(unsuited_table), dtype=np.int64)
+        _unsuited_keys = keys
+        _unsuited_scores = np.array([unsuited_table[key] for key in keys.tolist()], dtype=np.int32)
+    return _flush_scores, _unsuited_keys, _unsuited_scores
+
+def card_index(card):
+    """_summary_
+    Convert a treys card int to a card index
+    Args:
+        card (int): treys card int
+
+    Returns:
+        int: index from 0-51
+    """
+    rank = (card >> 8) & 0xF
+    suit = SUIT_BITS.index(card & 0xF000)
+    return rank * 4 + suit
+
+def score_cards(products, suit_masks):
+    """_summary_
+    Score arrays of 5-7 card hands, given in summarized form
+    Args:
+        products (ndarray): prime product of each hand's ranks
+        suit_masks (ndarray): shape (4, ...) rank mask of each suit for each hand
+
+    Returns:
+        ndarray: treys score of each hand
+    """
+    flush_scores, unsuited_keys, unsuited_scores = numpy_tables()
+    scores = unsuited_scores[np.searchsorted(unsuited_keys, products)]
+    for mask in suit_masks:
+        # At most one suit can hold 5 cards, and a flush is always the best hand available
+        scores = np.where(POPCOUNT[mask] >= 5, flush_scores[mask], scores)
+    return scores
+
+def summarize(indices):
+    """_summary_
+    Reduce card index arrays of shape (..., n) to prime products and suit rank masks
+    """
+    products = CARD_PRIMES[indices].prod(axis=-1)
+    suit_masks = np.stack([np.where(CARD_SUITS[indices] == suit, CARD_RANKBITS[indices], 0).sum(axis=-1) for suit in range(4)])
+    return products, suit_masks
+
+def score_runouts(hole_indices, boards):
+    """_summary_
+    Score every hand against every board
+    Args:
+        hole_indices (ndarray): shape (players, holecards) card indices
+        boards (ndarray): shape (runouts, 5) card indices
+
+    Returns:
+        ndarray: shape (runouts, players) treys scores
+    """
+    board_products, board_masks = summarize(boards)
+    hole_products, hole_masks = summarize(hole_indices)
+    # The board is summarized once per runout and combined with each player's holecards by broadcasting
+    products = board_products[:, None] * hole_products[None, :]
+    suit_masks = board_masks[:, :, None] + hole_masks[:, None, :]
+    return score_cards(products, suit_masks)
+
+# Batches in a row without one deal of disjoint hands after which range_tally gives up, so ranges which can never
+# Be dealt together, like AsAh against AsAh, fail instead of sampling forever
+MAX_EMPTY_BATCHES = 20
+
+class NoDisjointDealException(Exception):
+    pass
+
+OMAHA_PAIRS = np.array(list(combinations(range(4), 2)))
+BOARD_TRIPLES = np.array(list(combinations(range(5), 3)))
+
+def score_omaha_runouts(hole_indices, boards):
+    """_summary_
+    Score every Omaha hand against every board, each hand playing exactly 2 holecards and 3 board cards
+    The 6 holecard pairs and 10 board triples are summarized separately and combined by broadcasting,
+    So all 60 combinations of every hand on every board are scored in one batch
+    Args:
+        hole_indices (ndarray): shape (players, 4) card indices
+        boards (ndarray): shape (runouts, 5) card indices
+
+    Returns:
+        ndarray: shape (runouts, players) treys scores
+    """
+    pair_products, pair_masks = summarize(np.asarray(hole_indices)[:, OMAHA_PAIRS])
+    triple_products, triple_masks = summarize(np.asarray(boards)[:, BOARD_TRIPLES])
+    products = triple_products[:, None, None, :] * pair_products[None, :, :, None]
+    suit_masks = triple_masks[:, :, None, None, :] + pair_masks[:, None, :, :, None]
+    return score_cards(products, suit_masks).min(axis=(2, 3))
+
+# Runout scorer for each number of holecards, Hold'em's 7 card hands or Omaha's 2 holecards and 3 board cards
+# Only the full 52 card deck and its rankings are scored, short deck hands are not
+RUNOUT_SCORERS = {2: score_runouts, 4: score_omaha_runouts}
+
+def runout_scorer(hands):
+    """_summary_
+    Returns:
+        function: score_runouts for Hold'em hands, score_omaha_runouts for Omaha hands
+    """
+    hole_cards = len(hands[0])
+    if hole_cards not in RUNOUT_SCORERS or any(len(hand) != hole_cards for hand in hands):
+        raise ValueError("Hands must all be 2 card Hold'em hands or all be 4 card Omaha hands")
+    return RUNOUT_SCORERS[hole_cards]
+
+def tally(scores):
+    """_summary_
+    Count outright wins, ties, and the pot share won by each player over a batch of runouts
+    Args:
+        scores (ndarray): shape (runouts, players) treys scores
+
+    Returns:
+        tuple(ndarray, ndarray, ndarray, ndarray): wins, ties, sum of shares, and sum of squared shares, per player
+    """
+    winners = scores == scores.min(axis=1, keepdims=True)
+    num_winners = winners.sum(axis=1, keepdims=True)
+    shares = winners / num_winners
+    wins = (winners & (num_winners == 1)).sum(axis=0)
+    ties = (winners & (num_winners > 1)).sum(axis=0)
+    return wins, ties, shares.sum(axis=0), (shares ** 2).sum(axis=0)
+
+def monte_carlo_equity(hands, board, samples=100000, batch_size=10000, margin=0.005, seed=None):
+    """_summary_
+    Estimate the equity of each hand by sampling runouts of the board, in numpy batches
+    Cards in hands or on the board are removed from the 52 card deck, all other cards are unknown
+    Sampling stops early once the 95% confidence interval of every player's equity is within margin
+    Args:
+        hands (list): tuples of 2 treys card ints for Hold'em, or 4 for Omaha
+        board (list): 0 to 5 treys card ints
+        samples (int): maximum number of runouts to sample
+        batch_size (int): number of runouts to deal and score at once
+        margin (float): half width of the 95% confidence interval to stop at, 0 to always use every sample
+        seed (int): seed for the random generator, for repeatable estimates
+
+    Returns:
+        tuple(list, int): (win, tie, equity) fractions for each hand, and number of runouts sampled
+    """
+    score = runout_scorer(hands)
+    rng = np.random.default_rng(seed)
+    hole_indices = np.array([[card_index(card) for card in hand] for hand in hands])
+    board_indices = np.array([card_index(card) for card in board], dtype=np.int64)
+    known = set(hole_indices.flatten().tolist()) | set(board_indices.tolist())
+    unknown = np.array([index for index in range(52) if index not in known])
+    missing = 5 - len(board_indices)
+    players = len(hands)
+
+    wins = np.zeros(players)
+    ties = np.zeros(players)
+    share_sum = np.zeros(players)
+    share_squares = np.zeros(players)
+    sampled = 0
+    if missing == 0:
+        # The board is complete, so there is only one runout
+        samples = 1
+    while sampled < samples:
+        batch = min(batch_size, samples - sampled)
+        # Each row draws a random subset of unknown cards, by partitioning on random keys
+        keys = rng.random((batch, len(unknown)))
+        drawn = unknown[np.argpartition(keys, missing - 1, axis=1)[:, :missing]] if missing else np.empty((batch, 0), dtype=np.int64)
+        boards = np.concatenate([np.broadcast_to(board_indices, (batch, len(board_indices))), drawn], axis=1)
+        batch_wins, batch_ties, batch_shares, batch_squares = tally(score(hole_indices, boards))
+        wins += batch_wins
+        ties += batch_ties
+        share_sum += batch_shares
+        share_squares += batch_squares
+        sampled += batch
+        if margin > 0 and sampled < samples:
+            mean = share_sum / sampled
+            variance = np.maximum(share_squares / sampled - mean ** 2, 0)
+            if np.all(1.96 * np.sqrt(variance / sampled) < margin):
+                break
+
+    results = [(float(wins[player] / sampled), float(ties[player] / sampled), float(share_sum[player] / sampled)) for player in range(players)]
+    return results, sampled
+
+def exact_tally(hands, board, partition=0, partitions=1):
+    """_summary_
+    Score every possible runout of the board, or one partition of them
+    Runouts are partitioned by the position of their lowest card in the unknown cards, so that
+    Separate processes can enumerate disjoint partitions and have their tallies combined
+    Args:
+        hands (list): tuples of 2 treys card ints for Hold'em, or 4 for Omaha
+        board (list): 0 to 5 treys card ints
+        partition (int): index of the partition to enumerate
+        partitions (int): total number of partitions
+
+    Returns:
+        tuple(list, list, list, int): wins, ties and sum of shares per hand, and number of runouts
+    """
+    score = runout_scorer(hands)
+    hole_indices = np.array([[card_index(card) for card in hand] for hand in hands])
+    board_indices = [card_index(card) for card in board]
+    known = set(hole_indices.flatten().tolist()) | set(board_indices)
+    unknown = np.array([index for index in range(52) if index not in known])
+    missing = 5 - len(board_indices)
+    players = len(hands)
+
+    wins = np.zeros(players)
+    ties = np.zeros(players)
+    share_sum = np.zeros(players)
+    runouts = 0
+    if missing == 0:
+        first_positions = [0] if partition == 0 else []
+    else:
+        first_positions = range(partition, len(unknown) - missing + 1, partitions)
+    for first in first_positions:
+        if missing == 0:
+            drawn = np.empty((1, 0), dtype=np.int64)
+        else:
+            # Every combination of the remaining cards whose lowest card is unknown[first]
+            count = comb(len(unknown) - first - 1, missing - 1)
+            rest = np.fromiter(chain.from_iterable(combinations(range(first + 1, len(unknown)), missing - 1)),
+                               dtype=np.int64, count=count * (missing - 1)).reshape(count, missing - 1)
+            positions = np.concatenate([np.full((count, 1), first), rest], axis=1)
+            drawn = unknown[positions]
+        boards = np.concatenate([np.broadcast_to(np.array(board_indices, dtype=np.int64), (len(drawn), len(board_indices))), drawn], axis=1)
+        batch_wins, batch_ties, batch_shares, batch_squares = tally(score(hole_indices, boards))
+        wins += batch_wins
+        ties += batch_ties
+        share_sum += batch_shares
+        runouts += len(boards)
+    return wins.tolist(), ties.tolist(), share_sum.tolist(), runouts
+
+def combine_tallies(tallies):
+    """_summary_
+    Combine the tallies of every partition from exact_tally into equities
+    Returns:
+        list: (win, tie, equity) fractions for each hand
+    """
+    players = len(tallies[0][0])
+    runouts = sum(tally[3] for tally in tallies)
+    results = []
+    for player in range(players):
+        wins = sum(tally[0][player] for tally in tallies)
+        ties = sum(tally[1][player] for tally in tallies)
+        shares = sum(tally[2][player] for tally in tallies)
+        results.append((wins / runouts, ties / runouts, shares / runouts))
+    return results
+
+def exact_equity(hands, board):
+    """_summary_
+    Calculate the exact equity of each hand by enumerating every runout of the board
+    Returns:
+        list: (win, tie, equity) fractions for each hand
+    """
+    return combine_tallies([exact_tally(hands, board)])
+
+def range_tally(ranges, board, samples, seed=None, batch_size=20000):
+    """_summary_
+    Sample runouts of a matchup between ranges, dealing each player a hand from their range by weight
+    Deals where two hands share a card are discarded, so hand pairs are dealt in proportion to the product of their weights
+    Args:
+        ranges (list): dicts of hand -> weight, without hands blocked by the board
+        board (list): 0 to 5 treys card ints
+        samples (int): number of runouts to sample
+        seed (int): seed for the random generator
+
+    Returns:
+        tuple(list, list, list, int): wins, ties and sum of shares per range, and number of runouts
+
+    Raises:
+        NoDisjointDealException: no deal in MAX_EMPTY_BATCHES batches in a row gave every range a disjoint hand
+    """
+    rng = np.random.default_rng(seed)
+    hole_indices = []
+    probabilities = []
+    for hands in ranges:
+        hole_indices.append(np.array([[card_index(card) for card in hand] for hand in hands]))
+        weights = np.array(list(hands.values()), dtype=np.float64)
+        probabilities.append(weights / weights.sum())
+    board_indices = np.array([card_index(card) for card in board], dtype=np.int64)
+    board_mask = np.bitwise_or.reduce(np.int64(1) << board_indices) if len(board_indices) else np.int64(0)
+    missing = 5 - len(board_indices)
+    players = len(ranges)
+
+    wins = np.zeros(players)
+    ties = np.zeros(players)
+    share_sum = np.zeros(players)
+    sampled = 0
+    empty_batches = 0
+    while sampled < samples:
+        batch = min(batch_size, samples - sampled)
+        holes = np.stack([indices[rng.choice(len(indices), size=batch, p=probability)]
+                          for indices, probability in zip(hole_indices, probabilities)], axis=1)
+        hand_masks = ((np.int64(1) << holes[:, :, 0]) | (np.int64(1) << holes[:, :, 1]))
+        # Hands are disjoint exactly when adding their card masks carries no bits
+        disjoint = hand_masks.sum(axis=1) == np.bitwise_or.reduce(hand_masks, axis=1)
+        holes = holes[disjoint]
+        if len(holes) == 0:
+            empty_batches += 1
+            if empty_batches >= MAX_EMPTY_BATCHES:
+                raise NoDisjointDealException("The ranges almost never give every player different cards")
+            continue
+        empty_batches = 0
+        dead = np.bitwise_or.reduce(hand_masks[disjoint], axis=1) | board_mask
+        # Dead cards are given keys above every live card so they are never drawn
+        keys = rng.random((len(holes), 52)) + ((dead[:, None] >> np.arange(52)) & 1)
+        drawn = np.argpartition(keys, missing - 1, axis=1)[:, :missing] if missing else np.empty((len(holes), 0), dtype=np.int64)
+        boards = np.concatenate([np.broadcast_to(board_indices, (len(holes), len(board_indices))), drawn], axis=1)
+        board_products, board_suits = summarize(boards)
+        hole_products, hole_suits = summarize(holes)
+        scores = score_cards(board_products[:, None] * hole_products, board_suits[:, :, None] + hole_suits)
+        batch_wins, batch_ties, batch_shares, batch_squares = tally(scores)
+        wins += batch_wins
+        ties += batch_ties
+        share_sum += batch_shares
+        sampled += len(holes)
+    return wins.tolist(), ties.tolist(), share_sum.tolist(), sampled
+
+def range_equity(ranges, board=[], samples=200000, processes=1):
+    """_summary_
+    Estimate the equity of each range against the others, a single hand being a range of one hand
+    Args:
+        ranges (list): dicts of hand -> weight, from PokerGame.parse_range
+        board (list): 0 to 5 treys card ints
+        samples (int): number of runouts to sample
+        processes (int): number of processes to split sampling across
+
+    Returns:
+        list: (win, tie, equity) fractions for each range
+    """
+    dead = set(board)
+    ranges = [{hand: weight for hand, weight in hands.items() if hand[0] not in dead and hand[1] not in dead and weight > 0} for hands in ranges]
+    if any(len(hands) == 0 for hands in ranges):
+        raise ValueError("Every hand in a range is blocked by the board")
+    if processes == 1:
+        return combine_tallies([range_tally(ranges, board, samples)])
+    seeds = np.random.SeedSequence().spawn(processes)
+    shares = [samples // processes + (1 if ind < samples % processes else 0) for ind in range(processes)]
+    with ProcessPoolExecutor(processes) as executor:
+        tallies = list(executor.map(range_tally, [ranges] * processes, [board] * processes, shares, seeds))
+    return combine_tallies(tallies)
@@ -0,0 +1,96 @@
+from HandHistory import NO_SEAT, POST, BET, CALL, CHECK, FOLD, STREET, PAYOUT, RETURN, KIND_NAMES
+
+"""
+Typed events of each hand, delivered synchronously to subscribers of a PokerGame as it is played
+
+Subscribe with PokerGame.subscribe(callback), which calls callback(event) for every event below.
+Events come from the same hooks as the hand history recorders, so a game with no subscribers
+Does no extra work at all.
+"""
+
+ACTION_KINDS = (POST, BET, CALL, CHECK, FOLD)
+
+class HandStarted:
+    __slots__ = ("dealer", "seats")
+    def __init__(self, dealer, seats):
+        self.dealer = dealer
+        # Seats dealt in
+        self.seats = seats
+
+class ActionTaken:
+    __slots__ = ("seat", "action", "chips")
+    def __init__(self, seat, action, chips):
+        self.seat = seat
+        # "post", "bet", "call", "check" or "fold"
+        self.action = action
+        # Total bet for a bet, chips put in for a post or call, 0 otherwise
+        self.chips = chips
+
+class StreetDealt:
+    __slots__ = ("street", "cards")
+    def __init__(self, street, cards):
+        # Streets value of the new street
+        self.street = street
+        # Cards added to the board
+        self.cards = cards
+
+class PotAwarded:
+    __slots__ = ("seat", "chips", "uncalled")
+    def __init__(self, seat, chips, uncalled):
+        self.seat = seat
+        self.chips = chips
+        # Whether the chips are an uncalled bet given back rather than won
+        self.uncalled = uncalled
+
+class PlayerBusted:
+    __slots__ = ("seat",)
+    def __init__(self, seat):
+        self.seat = seat
+
+class HandEnded:
+    __slots__ = ("went_showdown",)
+    def __init__(self, went_showdown):
+        self.went_showdown = went_showdown
+
+class EventStream:
+    def __init__(self, previous):
+        """_summary_
+        Recorder which turns a game's recorder calls into events for its subscribers
+        Args:
+            previous (object): recorder the game had before it, restored once every subscriber is gone
+        """
+        self.previous = previous
+        self.subscribers = []
+        # Seats dealt into the current hand, None if it began before this stream was subscribed
+        self.dealt = None
+
+    def publish(self, event):
+        for subscriber in self.subscribers:
+            subscriber(event)
+
+    def begin(self, game):
+        self.dealt = game.remaining_hands
+        self.publish(HandStarted(game.dealer, self.dealt))
+
+    def record(self, kind, seat=NO_SEAT, value=0):
+        if kind in ACTION_KINDS:
+            self.publish(ActionTaken(seat, KIND_NAMES[kind], value))
+        elif kind == PAYOUT:
+            self.publish(PotAwarded(seat, value, False))
+        elif kind == RETURN:
+            self.publish(PotAwarded(seat, value, True))
+
+    def record_cards(self, kind, seat, cards):
+        if kind == STREET:
+            self.publish(StreetDealt(seat, tuple(cards)))
+
+    def end(self, game):
+        # Players left without chips have already been sat out by the game
+        # Seats emptied during the hand by a player who folded and cashed out have no chips either, but nobody busted
+        occupied = game.occupied_seats
+        dealt = self.dealt if self.dealt is not None else [seat for seat in range(game.seats) if game.hands[seat] is not None]
+        for seat in dealt:
+            if seat in occupied and game.stacks[seat] == 0:
+                self.publish(PlayerBusted(seat))
+        self.dealt = None
+        self.publish(HandEnded(game.went_showdown))
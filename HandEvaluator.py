@@ -0,0 +1,241 @@
+from treys import Card
+from treys.lookup import LookupTable
+from itertools import combinations
+
+"""
+Hand evaluation by direct table lookup, producing the same scores as treys.Evaluator
+(1 = royal flush, 7462 = 7 high) for 5, 6 or 7 cards
+
+Treys scores a 7 card hand by looking up all 21 of its 5 card subsets. Instead, the best
+5 card score is precomputed for every possible 6 and 7 card multiset of ranks, keyed by the
+product of the card primes (which is unique to the multiset), and for every flush suit
+pattern, keyed by the 13 bit mask of ranks in the suit. A hand is then scored in one lookup.
+
+Short deck hands are scored the same way from tables built for its 36 card deck and hand ranks,
+And Omaha hands by looking up each of their 60 two holecard, three board card combinations.
+"""
+
+# Best score of every flush, indexed by the 13 bit mask of ranks in the suit, 0 if not a flush
+_flush_table = None
+# Dict of best score for every 5, 6 and 7 card rank multiset, keyed by prime product
+_unsuited_table = None
+# Flush and unsuited tables of the short deck
+_short_deck_tables = None
+
+RANK_BITS = 13
+SUIT_MASK = 0xF000
+PRIME_MASK = 0xFF
+# Short deck is played without the 2s through 5s
+SHORT_DECK_RANKS = range(4, RANK_BITS)
+
+def rankbits_prime_product(rankbits):
+    return Card.prime_product_from_rankbits(rankbits)
+
+def build_flush_table(five_card_flushes, deck_ranks=range(RANK_BITS)):
+    # A 7 card hand holds at most 7 cards of a suit
+    table = [0] * (1 << RANK_BITS)
+    for size in range(5, 8):
+        for ranks in combinations(deck_ranks, size):
+            mask = 0
+            for rank in ranks:
+                mask |= 1 << rank
+            best = None
+            for five in combinations(ranks, 5):
+                rankbits = 0
+                for rank in five:
+                    rankbits |= 1 << rank
+                score = five_card_flushes[rankbits_prime_product(rankbits)]
+                if best is None or score < best:
+                    best = score
+            table[mask] = best
+    return table
+
+def build_unsuited_table(five_card_unsuited, deck_ranks=range(RANK_BITS)):
+    table = dict(five_card_unsuited)
+    previous = five_card_unsuited
+    # Every 6 card multiset is a 5 card multiset plus one rank, so its best score is the
+    # Minimum over the 5 card multisets it extends, and likewise for 7 from 6
+    for size in range(6, 8):
+        current = {}
+        for product, score in previous.items():
+            for prime in (Card.PRIMES[rank] for rank in deck_ranks):
+                # No rank may appear more than 4 times
+                if product % (prime ** 4) == 0:
+                    continue
+                extended = product * prime
+                if extended not in current or score < current[extended]:
+                    current[extended] = score
+        table.update(current)
+        previous = current
+    return table
+
+def lookup_tables():
+    """_summary_
+    Build the lookup tables on first use
+    Returns:
+        tuple(list, dict): flush table and unsuited table
+    """
+    global _flush_table, _unsuited_table
+    if _flush_table is None:
+        five_card = LookupTable()
+        _flush_table = build_flush_table(five_card.flush_lookup)
+        _unsuited_table = build_unsuited_table(five_card.unsuited_lookup)
+    return _flush_table, _unsuited_table
+
+def ranks_prime_product(ranks):
+    product = 1
+    for rank in ranks:
+        product *= Card.PRIMES[rank]
+    return product
+
+def short_deck_five_card_tables():
+    """_summary_
+    Score every 5 card short deck hand, 1 being the best as in treys
+    A flush beats a full house, three of a kind beats a straight, and A6789 is the lowest straight
+    Returns:
+        tuple(dict, dict): scores of flushes and of every other hand, keyed by prime product like treys.LookupTable
+    """
+    # Ranks from the highest, so combinations come out strongest first
+    ranks = sorted(SHORT_DECK_RANKS, reverse=True)
+    straights = [tuple(range(high, high - 5, -1)) for high in range(ranks[0], ranks[0] - 5, -1)]
+    # The ace plays low below the 6
+    straights.append((ranks[0],) + tuple(ranks[-4:]))
+    straight_products = {ranks_prime_product(straight) for straight in straights}
+    high_cards = [five for five in combinations(ranks, 5) if ranks_prime_product(five) not in straight_products]
+    quads = [(quad,) * 4 + (kicker,) for quad in ranks for kicker in ranks if kicker != quad]
+    full_houses = [(trips,) * 3 + (pair,) * 2 for trips in ranks for pair in ranks if pair != trips]
+    three_of_a_kinds = [(trips,) * 3 + kickers for trips in ranks for kickers in combinations([rank for rank in ranks if rank != trips], 2)]
+    two_pairs = [pairs * 2 + (kicker,) for pairs in combinations(ranks, 2) for kicker in ranks if kicker not in pairs]
+    pairs = [(pair,) * 2 + kickers for pair in ranks for kickers in combinations([rank for rank in ranks if rank != pair], 3)]
+    flushes = {}
+    unsuited = {}
+    # Categories from the best, each in order from its strongest hand
+    categories = [
+        (flushes, straights), (unsuited, quads), (flushes, high_cards), (unsuited, full_houses),
+        (unsuited, three_of_a_kinds), (unsuited, straights), (unsuited, two_pairs), (unsuited, pairs), (unsuited, high_cards)
+    ]
+    score = 1
+    for table, hands in categories:
+        for hand in hands:
+            table[ranks_prime_product(hand)] = score
+            score += 1
+    return flushes, unsuited
+
+def short_deck_tables():
+    """_summary_
+    Build the short deck lookup tables on first use
+    Returns:
+        tuple(list, dict): flush table and unsuited table, like lookup_tables
+    """
+    global _short_deck_tables
+    if _short_deck_tables is None:
+        flushes, unsuited = short_deck_five_card_tables()
+        _short_deck_tables = (build_flush_table(flushes, SHORT_DECK_RANKS), build_unsuited_table(unsuited, SHORT_DECK_RANKS))
+    return _short_deck_tables
+
+def evaluate(cards):
+    """_summary_
+    Score 5 to 7 cards
+    Args:
+        cards (list): treys card ints
+
+    Returns:
+        int: treys score of the best 5 card hand, lower is better
+    """
+    flush_table, unsuited_table = lookup_tables()
+    product = 1
+    suits = {}
+    for card in cards:
+        product *= card & PRIME_MASK
+        suit = card & SUIT_MASK
+        suits[suit] = suits.get(suit, 0) | (card >> 16)
+    for rankbits in suits.values():
+        # Neither quads nor a full house can coexist with a flush in 7 cards,
+        # So any flush is the best hand available
+        if rankbits.bit_count() >= 5:
+            return flush_table[rankbits]
+    return unsuited_table[product]
+
+def evaluate_hands(hands, board, tables=None):
+    """_summary_
+    Score many holecard combinations against a single board in one pass,
+    Only processing the board cards once
+    Args:
+        hands (list): tuples of treys card ints
+        board (list): treys card ints, 3 to 5 cards
+        tables (tuple): flush and unsuited tables to score with, the Hold'em tables by default
+
+    Returns:
+        list: treys score for each hand, in the same order as hands
+    """
+    flush_table, unsuited_table = lookup_tables() if tables is None else tables
+    board_product = 1
+    board_suits = {0x1000: 0, 0x2000: 0, 0x4000: 0, 0x8000: 0}
+    for card in board:
+        board_product *= card & PRIME_MASK
+        board_suits[card & SUIT_MASK] |= card >> 16
+    # Only suits with enough cards on board can make a flush with the holecards
+    flush_suits = [suit for suit, rankbits in board_suits.items() if rankbits.bit_count() + len(hands[0]) >= 5] if hands else []
+
+    scores = []
+    for hand in hands:
+        score = None
+        for suit in flush_suits:
+            rankbits = board_suits[suit]
+            for card in hand:
+                if card & suit:
+                    rankbits |= card >> 16
+            if rankbits.bit_count() >= 5:
+                score = flush_table[rankbits]
+                break
+        if score is None:
+            product = board_product
+            for card in hand:
+                product *= card & PRIME_MASK
+            score = unsuited_table[product]
+        scores.append(score)
+    return scores
+
+def evaluate_short_deck_hands(hands, board):
+    """_summary_
+    Score short deck hands against a board, see evaluate_hands and short_deck_five_card_tables
+    """
+    return evaluate_hands(hands, board, short_deck_tables())
+
+def evaluate_omaha_hands(hands, board):
+    """_summary_
+    Score Omaha hands, which play exactly 2 of their holecards with exactly 3 cards of the board
+    The board's 10 triples are summarized once, then each of a hand's 6 holecard pairs is combined
+    With each triple by multiplying prime products, so every one of the 60 combinations is one lookup
+    Args:
+        hands (list): tuples of 4 treys card ints
+        board (list): 5 treys card ints
+
+    Returns:
+        list: treys score for each hand, in the same order as hands
+    """
+    flush_table, unsuited_table = lookup_tables()
+    triples = []
+    for first, second, third in combinations(board, 3):
+        suit = first & SUIT_MASK
+        # Only a suited triple can make a flush, with a pair of holecards of its suit
+        if second & SUIT_MASK != suit or third & SUIT_MASK != suit:
+            suit = 0
+        product = (first & PRIME_MASK) * (second & PRIME_MASK) * (third & PRIME_MASK)
+        triples.append((product, suit, (first | second | third) >> 16))
+    scores = []
+    for hand in hands:
+        best = 7463
+        for first, second in combinations(hand, 2):
+            pair_product = (first & PRIME_MASK) * (second & PRIME_MASK)
+            pair_suit = first & SUIT_MASK if second & SUIT_MASK == first & SUIT_MASK else -1
+            pair_rankbits = (first | second) >> 16
+            for product, suit, rankbits in triples:
+                if suit == pair_suit:
+                    score = flush_table[rankbits | pair_rankbits]
+                else:
+                    score = unsuited_table[product * pair_product]
+                if score < best:
+                    best = score
+        scores.append(best)
+    return scores
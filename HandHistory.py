@@ -0,0 +1,301 @@
+import mmap
+import os
+import re
+import struct
+import time
+import numpy as np
+from treys import Card
+from Equity import card_index
+
+"""
+Append-only binary hand history, one series of files per table
+
+Every event of a hand is a fixed size record: kind (u8), seat (u8), value (u64), little endian.
+A hand starts with a HAND record and ends with an END record, and is only written once it ends,
+So files never hold partial hands. Files are named <table>-<sequence>.hh and roll over to the
+Next sequence number once they pass max_bytes, always between hands.
+
+File layout:
+    header: magic b"PKHH", version (u16), seats (u8), variant (u8), table id (u64)
+    The variant is the index of the table's game in PokerGame.VARIANTS, 0 for Hold'em as in files written before variants
+    records: 10 bytes each until the end of the file
+    Version 1 files hold 6 byte records with u32 values, they are still read but never appended to
+
+Record values:
+    HAND: seat = dealer, value = unix time
+    SB, BB, ANTE: value = the table's blinds and ante
+    STACK: stack of a seat dealt in, before blinds
+    HOLE, STREET: value = card indices + 1 packed a byte each, STREET's seat = the new Streets value
+    POST: chips posted as blinds and antes
+    BET: total bet, CALL: chips put in, CHECK, FOLD
+    PAYOUT: chips won from a pot, RETURN: uncalled chips given back
+    FINAL: stack of a seat dealt in, after the hand
+    END: seat = 1 if the hand went to showdown
+"""
+
+MAGIC = b"PKHH"
+VERSION = 2
+HEADER = struct.Struct("<4sHBBQ")
+RECORD = struct.Struct("<BBQ")
+# Record layout of each version that can be read
+RECORD_DTYPES = {
+    1: np.dtype([("kind", "u1"), ("seat", "u1"), ("value", "<u4")]),
+    2: np.dtype([("kind", "u1"), ("seat", "u1"), ("value", "<u8")])
+}
+RECORD_DTYPE = RECORD_DTYPES[VERSION]
+NO_SEAT = 255
+
+HAND = 0
+SB = 1
+BB = 2
+ANTE = 3
+STACK = 4
+HOLE = 5
+POST = 6
+BET = 7
+CALL = 8
+CHECK = 9
+FOLD = 10
+STREET = 11
+PAYOUT = 12
+RETURN = 13
+FINAL = 14
+END = 15
+KIND_NAMES = ["hand", "sb", "bb", "ante", "stack", "hole", "post", "bet", "call", "check", "fold", "street", "payout", "return", "final", "end"]
+
+# Treys card int for each card index
+INDEX_CARDS = [Card.new(rank + suit) for rank in Card.STR_RANKS for suit in "shdc"]
+
+def pack_cards(cards):
+    value = 0
+    for ind, card in enumerate(cards):
+        value |= (card_index(card) + 1) << (8 * ind)
+    return value
+
+def unpack_cards(value):
+    cards = []
+    while value:
+        cards.append(INDEX_CARDS[(value & 0xFF) - 1])
+        value >>= 8
+    return cards
+
+def history_files(directory, table_id):
+    """_summary_
+    Paths of a table's history files, oldest first
+    """
+    pattern = re.compile(rf"^{table_id}-(\d+)\.hh$")
+    sequences = []
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            match = pattern.match(name)
+            if match:
+                sequences.append(int(match.group(1)))
+    return [os.path.join(directory, f"{table_id}-{sequence:06d}.hh") for sequence in sorted(sequences)]
+
+def unpack_header(path, header):
+    magic, version, seats, variant, table_id = HEADER.unpack(header)
+    if magic != MAGIC or version not in RECORD_DTYPES:
+        raise ValueError(f"{path} is not a hand history file")
+    return version, seats, variant, table_id
+
+def read_header(path):
+    """_summary_
+    Returns:
+        tuple(int, int, int): seats, table id and variant of a history file
+    """
+    with open(path, "rb") as file:
+        version, seats, variant, table_id = unpack_header(path, file.read(HEADER.size))
+    return seats, table_id, variant
+
+def read_version(path):
+    with open(path, "rb") as file:
+        return unpack_header(path, file.read(HEADER.size))[0]
+
+class HandLog:
+    def __init__(self, directory, table_id, seats, variant=0, max_bytes=64 * 1024 * 1024):
+        """_summary_
+        Record the hands of a table, appending to its newest history file
+        Args:
+            directory (string): directory holding the history files
+            table_id (int): id of the table, like its channel id
+            seats (int): number of seats at the table
+            variant (int): index of the table's game in PokerGame.VARIANTS
+            max_bytes (int): size past which the next hand starts a new file
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.table_id = table_id
+        self.seats = seats
+        self.variant = variant
+        self.max_bytes = max_bytes
+        self.buffer = bytearray()
+        # Whether a hand has begun, events of a hand restored partway through are not recorded
+        self.recording = False
+        files = history_files(directory, table_id)
+        self.sequence = 0
+        self.file = None
+        if files:
+            self.sequence = int(files[-1].rsplit("-", 1)[1].split(".")[0])
+            self.file = open(files[-1], "ab")
+            if self.file.tell() >= HEADER.size and read_version(files[-1]) != VERSION:
+                # Records of an older version can't be mixed into its file, so hands continue in a new one
+                self.roll_over()
+        else:
+            self.roll_over()
+
+    def roll_over(self):
+        if self.file is not None:
+            self.file.close()
+            self.sequence += 1
+        path = os.path.join(self.directory, f"{self.table_id}-{self.sequence:06d}.hh")
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(HEADER.pack(MAGIC, VERSION, self.seats, self.variant, self.table_id))
+
+    def record(self, kind, seat=NO_SEAT, value=0):
+        if self.recording:
+            self.buffer += RECORD.pack(kind, seat, value)
+
+    def record_cards(self, kind, seat, cards):
+        if self.recording:
+            self.buffer += RECORD.pack(kind, seat, pack_cards(cards))
+
+    def begin(self, game):
+        """_summary_
+        Start recording a hand, once the dealer is set and before the blinds are posted
+        Any unfinished hand, like a deal which failed on a short stack, is dropped
+        """
+        self.buffer.clear()
+        self.recording = True
+        self.record(HAND, game.dealer, int(time.time()))
+        self.record(SB, NO_SEAT, game.sb)
+        self.record(BB, NO_SEAT, game.bb)
+        self.record(ANTE, NO_SEAT, game.ante)
+        for seat in game.remaining_hands:
+            self.record(STACK, seat, game.stacks[seat])
+        for seat in game.remaining_hands:
+            self.record_cards(HOLE, seat, game.hands[seat])
+
+    def end(self, game):
+        """_summary_
+        Finish the hand and append it to the file in one write
+        """
+        if not self.recording:
+            return
+        for seat in range(game.seats):
+            if game.hands[seat] is not None:
+                self.record(FINAL, seat, game.stacks[seat])
+        self.record(END, int(game.went_showdown), 0)
+        if self.file.tell() + len(self.buffer) > self.max_bytes and self.file.tell() > HEADER.size:
+            self.roll_over()
+        self.file.write(self.buffer)
+        self.file.flush()
+        self.buffer.clear()
+        self.recording = False
+
+    def close(self):
+        self.file.close()
+
+class Recorders:
+    """
+    Forward a game's events to several recorders, like a HandLog and a StatsRecorder
+    """
+    def __init__(self, *recorders):
+        self.recorders = recorders
+
+    def begin(self, game):
+        for recorder in self.recorders:
+            recorder.begin(game)
+
+    def record(self, kind, seat=NO_SEAT, value=0):
+        for recorder in self.recorders:
+            recorder.record(kind, seat, value)
+
+    def record_cards(self, kind, seat, cards):
+        for recorder in self.recorders:
+            recorder.record_cards(kind, seat, cards)
+
+    def end(self, game):
+        for recorder in self.recorders:
+            recorder.end(game)
+
+    def close(self):
+        for recorder in self.recorders:
+            if hasattr(recorder, "close"):
+                recorder.close()
+
+class HandHistoryReader:
+    def __init__(self, directory, table_id):
+        """_summary_
+        Read a table's history files by memory mapping them, one file at a time
+        Records are numpy views of the mapped file, so nothing is copied or decoded until it is used
+        """
+        self.paths = history_files(directory, table_id)
+
+    def records(self, path):
+        """_summary_
+        Map a history file
+        Returns:
+            ndarray: view of every record in the file, with the record layout of its version
+        """
+        with open(path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size <= HEADER.size:
+                return np.empty(0, dtype=RECORD_DTYPE)
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        dtype = RECORD_DTYPES[unpack_header(path, mapped[:HEADER.size])[0]]
+        count = (size - HEADER.size) // dtype.itemsize
+        return np.frombuffer(mapped, dtype=dtype, count=count, offset=HEADER.size)
+
+    def file_hands(self, path):
+        """_summary_
+        Iterate over the hands in one file
+        Yields:
+            ndarray: records of one hand, from its HAND record to its END record
+        """
+        records = self.records(path)
+        starts = np.flatnonzero(records["kind"] == HAND)
+        ends = np.append(starts[1:], len(records))
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            yield records[start:end]
+
+    def hands(self):
+        """_summary_
+        Iterate over every hand in order, see file_hands
+        """
+        for path in self.paths:
+            yield from self.file_hands(path)
+
+def decode_hand(records):
+    """_summary_
+    Convert the records of one hand into Python objects
+    Returns:
+        dict: dealer, time, blinds, stacks and hands by seat, events in order as (kind name, seat, value),
+        Final stacks by seat and whether it went to showdown
+    """
+    hand = {"events": [], "stacks": {}, "hands": {}, "board": [], "final": {}}
+    for kind, seat, value in records.tolist():
+        if kind == HAND:
+            hand["dealer"] = seat
+            hand["time"] = value
+        elif kind == SB:
+            hand["sb"] = value
+        elif kind == BB:
+            hand["bb"] = value
+        elif kind == ANTE:
+            hand["ante"] = value
+        elif kind == STACK:
+            hand["stacks"][seat] = value
+        elif kind == HOLE:
+            hand["hands"][seat] = tuple(unpack_cards(value))
+        elif kind == FINAL:
+            hand["final"][seat] = value
+        elif kind == END:
+            hand["showdown"] = bool(seat)
+        elif kind == STREET:
+            cards = unpack_cards(value)
+            hand["board"] += cards
+            hand["events"].append((KIND_NAMES[kind], seat, cards))
+        else:
+            hand["events"].append((KIND_NAMES[kind], seat, value))
+    return hand
@@ -0,0 +1,151 @@
+from HandHistory import BET, CALL, CHECK, FOLD, STREET, PAYOUT
+
+"""
+Player statistics, counted as each hand is played rather than computed from hand history
+
+A StatsRecorder receives a table's events like a HandLog does, and adds the counts of every
+Finished hand to a PlayerStats store keyed by Discord user ID. The store keeps the increments
+Made since its last flush, which are written to the database in one bulk write.
+"""
+
+STAT_NAMES = ["hands", "vpip", "pfr", "three_bet", "three_bet_chances", "saw_flop", "showdown", "won_showdown", "net"]
+HANDS, VPIP, PFR, THREE_BET, THREE_BET_CHANCES, SAW_FLOP, SHOWDOWN, WON_SHOWDOWN, NET = range(len(STAT_NAMES))
+PREFLOP_ACTIONS = (BET, CALL, CHECK, FOLD)
+
+class PlayerStats:
+    def __init__(self):
+        # User ID -> list of counts in STAT_NAMES order, for users whose stored totals have been loaded
+        self.totals = {}
+        # User ID -> list of counts added since the last flush
+        self.pending = {}
+
+    def add(self, userID, counts):
+        pending = self.pending.get(userID)
+        if pending is None:
+            self.pending[userID] = list(counts)
+        else:
+            for ind, count in enumerate(counts):
+                pending[ind] += count
+        totals = self.totals.get(userID)
+        if totals is not None:
+            for ind, count in enumerate(counts):
+                totals[ind] += count
+
+    async def get(self, userID, data_manager):
+        """_summary_
+        Get a user's stats, reading their stored totals only the first time they are asked for
+        Returns:
+            dict: stat name -> count
+        """
+        totals = self.totals.get(userID)
+        if totals is None:
+            stored = await data_manager.get_stats(userID)
+            if userID in self.totals:
+                # Another command read them while this one waited
+                return dict(zip(STAT_NAMES, self.totals[userID]))
+            pending = self.pending.get(userID, [0] * len(STAT_NAMES))
+            totals = [stored.get(name, 0) + count for name, count in zip(STAT_NAMES, pending)]
+            self.totals[userID] = totals
+        return dict(zip(STAT_NAMES, totals))
+
+    async def flush(self, data_manager):
+        """_summary_
+        Write every pending increment to the database in one bulk write
+        """
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, {}
+        try:
+            await data_manager.add_stats({userID: dict(zip(STAT_NAMES, counts)) for userID, counts in pending.items()})
+        except Exception:
+            # Keep the increments so the next flush retries them
+            for userID, counts in pending.items():
+                existing = self.pending.setdefault(userID, [0] * len(STAT_NAMES))
+                for ind, count in enumerate(counts):
+                    existing[ind] += count
+            raise
+
+class StatsRecorder:
+    def __init__(self, players, stats):
+        """_summary_
+        Count each player's stats over the hands of one table
+        Args:
+            players (list): user ID by seat, None for empty seats, like PokerTable.players
+            stats (PlayerStats): store the counts of each finished hand are added to
+        """
+        self.players = players
+        self.stats = stats
+        self.counts = None
+
+    def begin(self, game):
+        self.counts = {seat: [0] * len(STAT_NAMES) for seat in game.remaining_hands}
+        self.start_stacks = {seat: game.stacks[seat] for seat in self.counts}
+        # Players dealt in, since a player who folds may cash out and someone else sit down before the hand ends
+        self.seated = {seat: self.players[seat] for seat in self.counts}
+        self.folded = set()
+        self.preflop = True
+        # Number of preflop raises so far, the open raise being 1 and a 3-bet 2
+        self.raises = 0
+
+    def record(self, kind, seat=None, value=0):
+        if self.counts is None:
+            return
+        if kind == FOLD:
+            self.folded.add(seat)
+        if self.preflop and kind in PREFLOP_ACTIONS:
+            counts = self.counts[seat]
+            # Acting after exactly one raise is a chance to 3-bet
+            if self.raises == 1:
+                counts[THREE_BET_CHANCES] = 1
+            if kind == BET:
+                counts[VPIP] = 1
+                counts[PFR] = 1
+                if self.raises == 1:
+                    counts[THREE_BET] = 1
+                self.raises += 1
+            elif kind == CALL:
+                counts[VPIP] = 1
+        elif kind == STREET and self.preflop:
+            self.preflop = False
+            for seat, counts in self.counts.items():
+                if seat not in self.folded:
+                    counts[SAW_FLOP] = 1
+        elif kind == PAYOUT:
+            self.counts[seat][WON_SHOWDOWN] = 1
+
+    def record_cards(self, kind, seat, cards):
+        self.record(kind, seat)
+
+    def end(self, game):
+        if self.counts is None:
+            return
+        for seat, counts in self.counts.items():
+            userID = self.seated[seat]
+            counts[HANDS] = 1
+            if self.players[seat] == userID:
+                counts[NET] = game.stacks[seat] - self.start_stacks[seat]
+            else:
+                # Only a folded player can leave during a hand, having lost what they put in
+                counts[NET] = -game.chips_invested[seat]
+            if game.went_showdown and seat not in self.folded:
+                counts[SHOWDOWN] = 1
+            else:
+                # Winning a pot everyone else folded to is not winning at showdown
+                counts[WON_SHOWDOWN] = 0
+            if userID is not None:
+                self.stats.add(userID, counts)
+        self.counts = None
+
+def stats_to_string(userID, stats):
+    """_summary_
+    Describe a user's stats as percentages of the hands they had the chance to take each action in
+    """
+    def percent(count, chances):
+        return f"{count / chances:.1%}" if chances else "-"
+    hands = stats["hands"]
+    text = f"<@{userID}> over {hands} hands:\n"
+    text += f"VPIP: {percent(stats['vpip'], hands)}, PFR: {percent(stats['pfr'], hands)}, "
+    text += f"3-Bet: {percent(stats['three_bet'], stats['three_bet_chances'])}\n"
+    text += f"WTSD: {percent(stats['showdown'], stats['saw_flop'])}, W$SD: {percent(stats['won_showdown'], stats['showdown'])}\n"
+    text += f"Net: {stats['net']:+} chips"
+    return text
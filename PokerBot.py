@@ -1,13 +1,19 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import os
 from dotenv import load_dotenv, find_dotenv
 import json
 import asyncio
 import sys, traceback
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 
 from DataManager import *
 from PokerTable import *
+from Equity import *
+from PlayerStats import stats_to_string
+from Snapshot import SnapshotStore, restore_tables
 
 intents = discord.Intents.default()
 intents.message_content = True
@@ -16,7 +22,17 @@ client = commands.Bot(command_prefix='-', help_command=None, intents=intents, ca
 load_dotenv(find_dotenv())
 token = os.getenv("TOKEN")
 password = os.getenv("MONGO_PASS")
-manager = DataManager(password)
+manager = AsyncDataManager(DataManager(password))
+# Worker processes for CPU heavy work like exact equity enumeration
+equity_pool = ProcessPoolExecutor()
+RANGE_SAMPLES = 200000
+RANGE_JOBS = 4
+# Seconds between bulk writes of player stats
+STATS_FLUSH_INTERVAL = 60
+# Running tables are saved here whenever they change, and reopened when the bot starts
+snapshots = SnapshotStore(os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots"))
+# Seconds a table may sit idle between hands before it is hibernated to its snapshot
+HIBERNATE_AFTER = int(os.getenv("HIBERNATE_AFTER", 1800))
 # interface = CommandInterface(manager)
 
 def get_mentioned(mention_text):
@@ -27,6 +43,20 @@ def get_mentioned(mention_text):
                 return int(middle)
     return False
 
+def running_table(channelID):
+    """_summary_
+    Get the table running in a channel, rehydrating it if it was hibernated, and mark it active
+    Returns:
+        PokerTable: the table, or None if no table is running in the channel
+    """
+    table = PokerTable.running.get(channelID)
+    if table is None:
+        table = snapshots.rehydrate(channelID, manager)
+        if table is None:
+            return None
+    table.last_active = time.monotonic()
+    return table
+
 async def error(channel, message):
     await channel.send(f"Error: {message}")
 
@@ -34,23 +64,23 @@ async def error(channel, message):
 @commands.has_permissions(manage_channels=True)
 async def enable_channel(context):
     id = context.channel.id
-    manager.enable_channel(id)
+    await manager.enable_channel(id)
 
 @client.command(name="disable")
 @commands.has_permissions(manage_channels=True)
 async def disable_channel(context):
     id = context.channel.id
-    manager.disable_channel(id)
+    await manager.disable_channel(id)
 
 @client.command(name="chips", aliases=["getchips", "beg", "freechips"])
 async def free_chips(context):
     channelID = context.channel.id
-    channel_enabled = manager.channel_enabled(channelID)
+    channel_enabled = await manager.channel_enabled(channelID)
     if channel_enabled:
         userID = context.author.id
-        received, remaining_time = manager.generate_chips(userID)
+        received, remaining_time, balance = await manager.generate_chips(userID)
         if received:
-            await context.channel.send(f"Granted <@{userID}> {DataManager.free_chips} chips")
+            await context.channel.send(f"Granted <@{userID}> {DataManager.free_chips} chips, balance {balance}")
         else:
             await context.channel.send(f"Please wait {int(remaining_time)} seconds before asking for chips again")
 
@@ -58,7 +88,7 @@ async def free_chips(context):
 async def get_balance(context, *args):
     channel = context.channel
     channelID = channel.id
-    channel_enabled = manager.channel_enabled(channelID)
+    channel_enabled = await manager.channel_enabled(channelID)
     if not channel_enabled:
         return
     specific_user = False
@@ -75,13 +105,50 @@ async def get_balance(context, *args):
         userID = mentioned
     else:
         userID = context.author.id
-    balance = manager.get_chips(userID)
+    balance = await manager.get_chips(userID)
     await channel.send(f"<@{userID}> has {balance} chips")
 
+@client.command(name="stats", aliases=["stat", "hud"])
+async def stats(context, *args):
+    channel = context.channel
+    if not await manager.channel_enabled(channel.id):
+        return
+    if len(args) > 0:
+        userID = get_mentioned(args[0])
+        if not userID:
+            return
+    else:
+        userID = context.author.id
+    player_stats = await PokerTable.stats.get(userID, manager)
+    if player_stats["hands"] == 0:
+        await channel.send(f"<@{userID}> has not played any hands yet")
+        return
+    await channel.send(stats_to_string(userID, player_stats))
+
+@tasks.loop(seconds=STATS_FLUSH_INTERVAL)
+async def flush_stats():
+    await PokerTable.stats.flush(manager)
+
+@tasks.loop(seconds=60)
+async def hibernate_tables():
+    hibernated = snapshots.hibernate_idle(HIBERNATE_AFTER)
+    if hibernated:
+        resident, total_hibernated = snapshots.table_counts()
+        print(f"Hibernated {hibernated} idle tables, {resident} resident, {total_hibernated} hibernated")
+
+@client.command(name="status", aliases=["botstatus"])
+@commands.has_permissions(manage_channels=True)
+async def status(context):
+    resident, hibernated = snapshots.table_counts()
+    cache = await manager.cache_stats()
+    hit_rate = cache["hits"] / max(cache["hits"] + cache["misses"], 1)
+    await context.channel.send(f"Tables: {resident} resident, {hibernated} hibernated\n"
+                               f"Player cache: {cache['size']} players, {hit_rate:.0%} hits, {cache['expirations']} expired, {cache['evictions']} evicted")
+
 @client.command(name="give", aliases=["transfer", "donate"])
 async def give(context, user, amount):
     channel = context.channel
-    channel_enabled = manager.channel_enabled(channel.id)
+    channel_enabled = await manager.channel_enabled(channel.id)
     if not channel_enabled:
         return
     mentioned = get_mentioned(user)
@@ -96,16 +163,17 @@ async def give(context, user, amount):
         await error(channel, "Please enter a positive integer amount")
         return
     giverID = context.author.id
-    giver_balance = manager.get_chips(giverID)
-    amount = min(giver_balance, amount)
-    manager.add_chips(mentioned, amount)
-    manager.remove_chips(giverID, amount)
+    # Chips are taken before they are given, so a failure between the two never creates chips
+    if await manager.take_chips(giverID, amount) is None:
+        await error(channel, f"<@{giverID}> does not have {amount} chips to give")
+        return
+    await manager.add_chips(mentioned, amount)
     await channel.send(f"<@{giverID}> gave {amount} chips to <@{mentioned}>")
 
 @client.command(name="create")
 async def create_table(context, *args):
     channel = context.channel
-    enabled = manager.channel_enabled(channel.id)
+    enabled = await manager.channel_enabled(channel.id)
     if not enabled:
         return
     if len(args) == 1:
@@ -121,10 +189,10 @@ async def create_table(context, *args):
         return
     name = args[0]
     userID = context.author.id
-    if manager.table_exists(userID, name):
+    if await manager.table_exists(userID, name):
         await error(channel, "You've already created a table with that name")
         return
-    success = manager.create_table(userID, name, options)
+    success = await manager.create_table(userID, name, options)
     if success:
         await channel.send(f"<@{userID}> created table {name}")
     else:
@@ -134,12 +202,11 @@ async def create_table(context, *args):
 async def options(context, *args):
     channel = context.channel
     channelID = channel.id
-    if not manager.channel_enabled(channelID):
+    if not await manager.channel_enabled(channelID):
         return
-    running = channelID in PokerTable.running
+    table = running_table(channelID)
     if len(args) == 0:
-        if running:
-            table = PokerTable.running[channelID]
+        if table is not None:
             table_name = table.name
             userID = table.runnerID
             options = table.options
@@ -148,18 +215,19 @@ async def options(context, *args):
     elif len(args) == 1:
         userID = context.author.id
         table_name = args[0]
-        options = manager.get_table(userID, table_name)
+        options = await manager.get_table(userID, table_name)
     else:
         userID = get_mentioned(args[0])
         if not userID:
             return
         table_name = args[1]
-        options = manager.get_table(userID, table_name)
+        options = await manager.get_table(userID, table_name)
     if not options:
         return
     text = f"Options for <@{userID}>'s table: {table_name}```"
+    defaults = default_table_options()
     for option in options_order:
-        setting = options[option]
+        setting = options.get(option, defaults[option])
         match(option):    
             case "min_buy":    
                 setting = f"{setting}bb"
@@ -169,6 +237,8 @@ async def options(context, *args):
                 setting = "Enabled" if setting else "Disabled"
             case "time_bank":
                 setting = f"{setting} seconds"
+            case "game":
+                setting = VARIANTS[setting].name
             
         text += f"{option}: {setting}\n"
     text += f"\nOptions String:\n{get_options_string(options)}```"
@@ -178,13 +248,13 @@ async def options(context, *args):
 async def set_options(context, *args):
     channel = context.channel
     channelID = channel.id
-    if not manager.channel_enabled(channelID):
+    if not await manager.channel_enabled(channelID):
         return
     if len(args) == 0:
         return
     userID = context.author.id
     table_name = args[0]
-    options = manager.get_table(userID, table_name)
+    options = await manager.get_table(userID, table_name)
     running = False
     for name in PokerTable.running:
         table = PokerTable.running[name]
@@ -198,7 +268,7 @@ async def set_options(context, *args):
 async def get_tables(context, *args):
     channel = context.channel
     channelID = channel.id
-    if not manager.channel_enabled(channelID):
+    if not await manager.channel_enabled(channelID):
         return
     if len(args) == 0:
         userID = context.author.id
@@ -206,7 +276,7 @@ async def get_tables(context, *args):
         userID = get_mentioned(args[0])
         if not userID:
             return
-    tables = manager.get_table_names(userID)
+    tables = await manager.get_table_names(userID)
     text = f"Tables owned by <@{userID}>:"
     if len(tables) != 0:
         has_tables = True
@@ -221,80 +291,85 @@ async def get_tables(context, *args):
 @client.command(name="delete")
 async def delete_table(context, table_name):
     channel = context.channel
-    enabled = manager.channel_enabled(channel.id)
+    enabled = await manager.channel_enabled(channel.id)
     if not enabled:
         return
     userID = context.author.id
-    if not manager.table_exists(userID, table_name):
+    if not await manager.table_exists(userID, table_name):
         return
-    manager.delete_table(userID, table_name)
+    await manager.delete_table(userID, table_name)
     await channel.send(f"<@{userID}> deleted table {table_name}")
     
 @client.command(name="open", aliases=["opentable", "starttable", "runtable", "run"])
 async def open_table(context, table_name):
     channel = context.channel
-    enabled = manager.channel_enabled(channel.id)
+    enabled = await manager.channel_enabled(channel.id)
     if not enabled:
         return
     userID = context.author.id
     channelID = context.channel.id
-    if channelID in PokerTable.running:
-        await error(channel, f"Table {PokerTable.running[channelID].name} is already running in this channel")
+    running = running_table(channelID)
+    if running is not None:
+        await error(channel, f"Table {running.name} is already running in this channel")
         return
-    options = manager.get_table(userID, table_name)
+    options = await manager.get_table(userID, table_name)
     if not options:
         await error(channel, f"You do not own a table named {table_name}")
         return
     table = PokerTable(table_name, channelID, userID, options, manager)
+    snapshots.save(table)
     await channel.send(f"Table {table_name} is now running")
 
 @client.command(name="close", aliases=["closetable", "endtable", "end"])
 async def close_table(context):
     channel = context.channel
-    if channel.id not in PokerTable.running:
+    table = running_table(channel.id)
+    if table is None:
         return
-    table = PokerTable.running[channel.id]
     authorID = context.author.id
     channel_manager = context.author.guild_permissions.manage_channels
     may_close = channel_manager or authorID == table.runnerID
     if not may_close:
         return
-    close(channel.id)
+    if await close(channel.id):
+        snapshots.delete(channel.id)
     await channel.send(f"Closed table: {table.name}")
 
 @client.command(name="buyin", aliases=["buy"])
 async def buyin(context, seat, stack):
     channel = context.channel
     channelID = channel.id
-    if channelID not in PokerTable.running:
+    table = running_table(channelID)
+    if table is None:
         return
     userID = context.author.id
-    table = PokerTable.running[channelID]
     if not (seat.isnumeric() and stack.isnumeric()):
         return
     seat = int(seat)
     stack = int(stack)
-    success = table.buyin(userID, seat, stack)
+    success = await table.buyin(userID, seat, stack)
     if not success:
         await error(channel, f"Failed to buyin at seat {seat} with {stack} chips")
         return
+    snapshots.save(table)
     await channel.send(f"Player: <@{userID}> sitting at seat {seat} with {stack} chips")
 
 @client.command(name="addon", aliases=["add", "rebuy"])
 async def addon(context, chips):
     channel = context.channel
     channelID = channel.id
-    if channelID not in PokerTable.running:
+    table = running_table(channelID)
+    if table is None:
         return
     userID = context.author.id
-    table = PokerTable.running[channelID]
     if not (chips.isnumeric()):
         return
     chips = int(chips)
-    success = table.addon(userID, chips)
+    success = await table.addon(userID, chips)
     if not success:
         await error(channel, f"Failed to increase <@{userID}> stack by {chips} chips")
         return
+    snapshots.save(table)
     seat = table.players.index(userID)
     new_stack = table.game.stacks[seat]
     await channel.send(f"Player: <@{userID}> increased stack to {new_stack} chips")
@@ -303,42 +378,55 @@ async def addon(context, chips):
 async def sitin(context):
     channel = context.channel
     channelID = channel.id
-    if channelID not in PokerTable.running:
+    table = running_table(channelID)
+    if table is None:
         return
     userID = context.author.id
-    table = PokerTable.running[channelID]
     success = table.sitin(userID)
     if not success:
         return
+    snapshots.save(table)
     await channel.send(f"Player: <@{userID}> sitting in")
 
 @client.command(name="sitout", aliases=["situp", "stand"])
 async def sitout(context):
     channel = context.channel
     channelID = channel.id
-    if channelID not in PokerTable.running:
+    table = running_table(channelID)
+    if table is None:
         return
     userID = context.author.id
-    table = PokerTable.running[channelID]
     success = table.sitout(userID)
     if not success:
         return
+    snapshots.save(table)
     await channel.send(f"Player <@{userID}> has stood up")
 
 @client.command(name="cashout", aliases=["cash", "leave", "buyout"])
 async def cashout(context):
     channel = context.channel
     channelID = channel.id
-    if channelID not in PokerTable.running:
+    table = running_table(channelID)
+    if table is None:
         return
     userID = context.author.id
-    table = PokerTable.running[channelID]
-    success = table.cashout(userID)
+    success = await table.cashout(userID)
     if not success:
         return
+    snapshots.save(table)
     chips = 0 if success == -1 else success
     await channel.send(f"Player <@{userID}> cashed out for {chips} chips")
 
+async def send_state(channel, table):
+    snapshots.save(table)
+    # While the hand runs only what changed is sent, the whole table is shown once the hand is over
+    if table.game.hand_running():
+        await channel.send(table.changes())
+        return
+    # If the hand was run out allin, calculate the equities at each street before showing the result
+    await table.calculate_runout_equity(equity_pool)
+    await channel.send(table.changes() + "\n" + table.state())
+
 async def message_hand(hand, user):
     await user.send(f"Your Hand:\n{hand_to_string(hand)}")
 
@@ -365,29 +453,29 @@ async def continue_action(channel):
     table = PokerTable.running[channelID]
     game = table.game
     table.current_action_id += 1
-    acting_seat = game.action_permissions[0]
+    acting_seat = game.acting_seat
     playerID = table.players[acting_seat]
     time_bank = table.time_bank
     check = game.may_check()
     if check:
         game.check()
     else:
-        acting_seat = game.action_permissions[0]
+        acting_seat = game.acting_seat
         game.fold()
         game.sitout(acting_seat)
     await channel.send(f"<@{playerID}> auto-{'checked' if check else 'folded and sat out'} after {time_bank} seconds")
-    await channel.send(table.state())
+    await send_state(channel, table)
     await run_clock(channel, table.current_action_id)
 
 @client.command(name="deal", aliases=["play"])
 async def deal(context):
     channel = context.channel
     channelID = channel.id
-    if channelID not in PokerTable.running:
+    table = running_table(channelID)
+    if table is None:
         return
     author = context.author
     userID = author.id
-    table = PokerTable.running[channelID]
     game = table.game
     if game.hand_running():
         return
@@ -398,6 +486,9 @@ async def deal(context):
     except (NoPlayersException, ShortStackException):
         return
     table.current_action_id += 1
+    snapshots.save(table)
+    # The full state below covers the blinds, so they are not sent again as changes
+    table.events.clear()
     messages = []
     for seat in game.active_seats:
         hand = game.hands[seat]
@@ -409,26 +500,131 @@ async def deal(context):
     await asyncio.gather(*messages)
     await run_clock(channel, table.current_action_id)
 
+def parse_cards(text):
+    """_summary_
+    Parse a sequence of card names like 'AsKd', case insensitive
+    Args:
+        text (string): card names
+
+    Returns:
+        list: treys card ints, or False if the text is not a valid sequence of cards
+    """
+    if len(text) == 0 or len(text) % 2 != 0:
+        return False
+    names = ""
+    for ind in range(0, len(text), 2):
+        names += text[ind].upper() + text[ind+1].lower()
+    try:
+        return cards(names)
+    except KeyError:
+        return False
+
+@client.command(name="equity", aliases=["odds", "eq"])
+async def equity(context, *args):
+    """_summary_
+    Estimate the equity of 2 or more hands or ranges, with an optional board
+    Usage: -equity AsKd QhQc [Qs5s2d]
+    Omaha: -equity AsKsQdJd 9h9c8h8c [Qs5s2d]
+    Ranges: -equity QQ+,AKs,A5s-A2s:0.5 JTs [Qs5s2d]
+    4 cards after Hold'em hands are the turn, otherwise an Omaha hand, so an Omaha turn is written after on:
+    -equity AsKsQdJd 9h9c8h8c on Qs5s2d7c
+    """
+    channel = context.channel
+    if not await manager.channel_enabled(channel.id):
+        return
+    hands = []
+    ranges = []
+    names = []
+    board = []
+    # Cards in each hand, 2 for Hold'em hands and ranges or 4 for Omaha hands
+    hand_size = None
+    on_board = False
+    for arg in args:
+        if arg.lower() == "on":
+            on_board = True
+            continue
+        parsed = parse_cards(arg)
+        if parsed and 3 <= len(parsed) <= 5 and len(board) == 0 and (on_board or len(parsed) != 4 or hand_size == 2):
+            board = parsed
+            on_board = False
+            continue
+        if on_board:
+            await error(channel, f"Invalid board: {arg}")
+            return
+        if parsed and len(parsed) in (2, 4):
+            size = len(parsed)
+            hands.append(tuple(parsed))
+            ranges.append({combo(*parsed): 1} if size == 2 else None)
+            names.append(hand_to_string(parsed))
+        else:
+            try:
+                ranges.append(parse_range(arg))
+                hands.append(None)
+                names.append(arg)
+                size = 2
+            except InvalidRangeException:
+                await error(channel, f"Invalid hand, range or board: {arg}")
+                return
+        if hand_size is not None and size != hand_size:
+            await error(channel, "Hold'em and Omaha hands can't be compared")
+            return
+        hand_size = size
+    if len(hands) < 2:
+        await error(channel, "Please enter at least 2 hands")
+        return
+    if None not in hands:
+        known = board + [card for hand in hands for card in hand]
+        if len(set(known)) != len(known):
+            await error(channel, "The same card cannot appear twice")
+            return
+        if len(hands) == 2 and len(board) == 0 and hand_size == 2 and PokerGame.preflop_table is not None:
+            # Heads-up preflop matchups are looked up in the precomputed table, an estimate as close as sampling gives
+            win, tie, share = PokerGame.preflop_table.matchup(hands[0], hands[1])
+            results, sampled = [(win, tie, share), (1 - win - tie, tie, 1 - share)], PokerGame.preflop_table.boards
+        else:
+            # Sampling runs in a worker thread so the event loop keeps serving other tables
+            results, sampled = await asyncio.to_thread(monte_carlo_equity, hands, board)
+    else:
+        ranges = [remove_blocked(hands_range, board) for hands_range in ranges]
+        if any(len(hands_range) == 0 for hands_range in ranges):
+            await error(channel, "Every hand in a range is blocked by the board")
+            return
+        # Range sampling is split across the worker processes, each with its own seed
+        loop = asyncio.get_running_loop()
+        jobs = [loop.run_in_executor(equity_pool, range_tally, ranges, board, RANGE_SAMPLES // RANGE_JOBS, seed)
+                for seed in np.random.SeedSequence().spawn(RANGE_JOBS)]
+        try:
+            tallies = await asyncio.gather(*jobs)
+        except NoDisjointDealException:
+            await error(channel, "These ranges can't be dealt without two players sharing a card")
+            return
+        results, sampled = combine_tallies(tallies), sum(tally[3] for tally in tallies)
+    text = ""
+    if len(board) > 0:
+        text += "Board: " + " ".join(card_to_string(card) for card in board) + "\n"
+    for name, (win, tie, share) in zip(names, results):
+        text += f"{name}: {share:.1%} (win {win:.1%}, tie {tie:.1%})\n"
+    text += f"{sampled} runouts"
+    await channel.send(text)
+
 def positive_float(num):
     return num.replace(".", "").isnumeric()
 
 def calculate_size(game, size):
-    acting_player_seat = game.action_permissions[0]
-    acting_player_bet = game.current_bets[acting_player_seat]
-    acting_player_stack = game.stacks[acting_player_seat]
-    previous_raise = game.previous_raise
+    legal_actions = game.legal_actions()
+    if legal_actions is None:
+        return False
     current_bet = game.current_bet
-    difference = current_bet - acting_player_bet
-    total_pot = game.pot + sum(game.current_bets) + difference
+    total_pot = legal_actions.pot
     bb = game.bb
     size = size.lower()
     match(size):
         case "allin" | "ai" | "all" | "stack":
-            return acting_player_stack + acting_player_bet
+            return legal_actions.max_bet
         case "pawt" | "pot":
             return total_pot + current_bet
         case "min" | "minraise" | "minimum":
-            return previous_raise + current_bet
+            return legal_actions.min_bet
     if size.endswith('%'):
         percent = size[:len(size)-1]
         if not positive_float(percent):
@@ -452,11 +648,11 @@ def calculate_size(game, size):
 async def bet(context, size):
     channel = context.channel
     channelID = channel.id
-    if channelID not in PokerTable.running:
+    table = running_table(channelID)
+    if table is None:
         return
     author = context.author
     userID = author.id
-    table = PokerTable.running[channelID]
     game = table.game
     if not game.hand_running():
         return
@@ -471,18 +667,18 @@ async def bet(context, size):
     except InvalidBetException:
         return
         
-    await channel.send(table.state())
+    await send_state(channel, table)
     await run_clock(channel, table.current_action_id)
 
 @client.command(aliases=["cawl"])
 async def call(context):
     channel = context.channel
     channelID = channel.id
-    if channelID not in PokerTable.running:
+    table = running_table(channelID)
+    if table is None:
         return
     author = context.author
     userID = author.id
-    table = PokerTable.running[channelID]
     game = table.game
     if not game.hand_running():
         return
@@ -494,18 +690,18 @@ async def call(context):
     except InvalidCallException:
         return
 
-    await channel.send(table.state())
+    await send_state(channel, table)
     await run_clock(channel, table.current_action_id)
 
 @client.command()
 async def check(context):
     channel = context.channel
     channelID = channel.id
-    if channelID not in PokerTable.running:
+    table = running_table(channelID)
+    if table is None:
         return
     author = context.author
     userID = author.id
-    table = PokerTable.running[channelID]
     game = table.game
     if not game.hand_running():
         return
@@ -517,18 +713,18 @@ async def check(context):
     except InvalidCheckException:
         return
 
-    await channel.send(table.state())
+    await send_state(channel, table)
     await run_clock(channel, table.current_action_id)
 
 @client.command()
 async def fold(context):
     channel = context.channel
     channelID = channel.id
-    if channelID not in PokerTable.running:
+    table = running_table(channelID)
+    if table is None:
         return
     author = context.author
     userID = author.id
-    table = PokerTable.running[channelID]
     game = table.game
     if not game.hand_running():
         return
@@ -537,9 +733,18 @@ async def fold(context):
     game.fold()
     table.current_action_id += 1
 
-    await channel.send(table.state())
+    await send_state(channel, table)
     await run_clock(channel, table.current_action_id)
 
+@client.event
+async def on_ready():
+    await manager.ensure_indexes()
+    await manager.load_channels()
+    if not flush_stats.is_running():
+        flush_stats.start()
+    if not hibernate_tables.is_running():
+        hibernate_tables.start()
+
 @client.event
 async def on_command_error(context, error):
     print(f"Command: {context.command.name} invoked incorrectly")
@@ -566,5 +771,7 @@ async def on_message(message):
 
 
 
-client.run(token)
-
+if __name__ == '__main__':
+    restored, seconds = restore_tables(snapshots, manager)
+    print(f"Restored {restored} tables in {seconds:.2f} seconds, {len(snapshots.hibernated)} left hibernated")
+    client.run(token)
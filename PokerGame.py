@@ -1,7 +1,11 @@
-from treys import Evaluator, Card
+from treys import Card
+from HandEvaluator import evaluate_hands, evaluate_omaha_hands, evaluate_short_deck_hands
+from PreflopTable import load_preflop_table
+from Shuffle import secure_source, SeededSource
+from HandHistory import POST, BET, CALL, CHECK, FOLD, STREET, PAYOUT, RETURN, Recorders
+from Events import EventStream
 from more_itertools import chunked
 from enum import Enum
-import random
 
 class SeatOccupiedException(Exception):
     pass
@@ -27,17 +31,58 @@ class InvalidSeatException(Exception):
     pass
 class InvalidSitInException(Exception):
     pass
+class InvalidRangeException(Exception):
+    pass
 
 """
-Append value into array of numbers, maintaining small -> large order of array
+Seat sets are stored as integer bitmasks, where bit n is set if seat n is in the set
 """
-def inorder_append(num_arr, val):
-    for ind, num in enumerate(num_arr):
-        if num < val:
-            continue
-        num_arr.insert(ind, val)
-        return
-    num_arr.append(val)
+def seat_bit(seat):
+    return 1 << seat
+
+"""
+Returns number of seats contained in a seat mask
+"""
+def popcount(mask):
+    return mask.bit_count()
+
+"""
+Returns the lowest seat contained in a seat mask
+"""
+def lowest_seat(mask):
+    return (mask & -mask).bit_length() - 1
+
+"""
+Returns the first seat in the mask clockwise from seat, excluding seat itself unless it is the only one in the mask
+"""
+def next_seat(mask, seat):
+    higher = (mask >> (seat + 1)) << (seat + 1)
+    if higher == 0:
+        higher = mask
+    return lowest_seat(higher)
+
+"""
+Returns list of seats contained in a seat mask, from small -> large
+"""
+def mask_seats(mask):
+    seats = []
+    while mask:
+        low = mask & -mask
+        seats.append(low.bit_length() - 1)
+        mask ^= low
+    return seats
+
+"""
+Returns list of seats contained in a seat mask, in clockwise order beginning at seat
+"""
+def rotation(mask, seat):
+    seats = []
+    while mask:
+        seats.append(seat)
+        mask &= ~seat_bit(seat)
+        if mask:
+            seat = next_seat(mask, seat)
+    return seats
 
 class Streets(Enum):
     Preflop = 0
@@ -61,33 +106,266 @@ Returns a list of Cards given a string sequence of names like 'AsTd5c'
 def cards(names):
     return [card(name) for name in chunked(names, 2)]
 
-def deck():
-    suits = ['c', 'h', 's', 'd']
-    ranks = ['2', '3', '4', '5', '6', '7', '8', '9', 'T', 'J', 'Q', 'K', 'A']
-    names = ""
-    for rank in ranks:
-        for suit in suits:
-            names += f"{rank}{suit}"
-    shuffled = cards(names)
-    random.shuffle(shuffled)
-    return shuffled
+RANKS = "23456789TJQKA"
+SUITS = "shdc"
 
-class PokerGame:
-    evaluator = Evaluator()
+"""
+Returns a hand as a tuple of 2 Cards, higher card first, so that equal hands compare equal
+"""
+def combo(first, second):
+    return (first, second) if first > second else (second, first)
+
+"""
+Returns list of all hands of a class, given rank indices (high >= low) and 's' for suited, 'o' for offsuit or '' for both
+"""
+def class_combos(high, low, kind):
+    hands = []
+    for high_suit in SUITS:
+        for low_suit in SUITS:
+            if high == low and SUITS.index(low_suit) <= SUITS.index(high_suit):
+                continue
+            suited = high_suit == low_suit
+            if (kind == 's' and not suited) or (kind == 'o' and suited):
+                continue
+            hands.append(combo(card(RANKS[high] + high_suit), card(RANKS[low] + low_suit)))
+    return hands
+
+"""
+Parses a hand class like 'AKs', 'T9o', 'QQ' or 'AK' into (high rank, low rank, kind)
+"""
+def parse_class(text):
+    if len(text) not in [2, 3] or text[0] not in RANKS or text[1] not in RANKS:
+        raise InvalidRangeException(text)
+    high = RANKS.index(text[0])
+    low = RANKS.index(text[1])
+    kind = text[2] if len(text) == 3 else ''
+    if high < low:
+        high, low = low, high
+    if kind not in ['', 's', 'o'] or (high == low and kind != ''):
+        raise InvalidRangeException(text)
+    return high, low, kind
+
+"""
+Returns list of (high rank, low rank, kind) classes covered by one range term like 'QQ+', 'ATs+', '76s-54s' or 'AKo'
+"""
+def range_classes(term):
+    if term.endswith('+'):
+        high, low, kind = parse_class(term[:-1])
+        if high == low:
+            # Pairs go up to aces
+            return [(rank, rank, kind) for rank in range(low, len(RANKS))]
+        # Kickers go up to one below the high card
+        return [(high, rank, kind) for rank in range(low, high)]
+    if '-' in term:
+        first, last = term.split('-', 1)
+        first = parse_class(first)
+        last = parse_class(last)
+        if first[2] != last[2]:
+            raise InvalidRangeException(term)
+        kind = first[2]
+        gap = first[0] - first[1]
+        if gap == last[0] - last[1] and (gap == 0 or first[0] != last[0]):
+            # Pairs or connectors sliding down together, like 'QQ-88' or '76s-54s'
+            start, end = sorted([first[1], last[1]])
+            return [(rank + gap, rank, kind) for rank in range(start, end + 1)]
+        if first[0] == last[0]:
+            # Kickers under a fixed high card, like 'A5s-A2s'
+            start, end = sorted([first[1], last[1]])
+            return [(first[0], rank, kind) for rank in range(start, end + 1)]
+        raise InvalidRangeException(term)
+    return [parse_class(term)]
+
+"""
+Returns dict of hand -> weight given a range like 'QQ+, AKs, 76s-54s, AsKd, AQo:0.5'
+A term may end in :weight to include its hands with that weight, otherwise the weight is 1
+Later terms override the weight of hands in earlier terms, and hands left with weight 0 are dropped
+"""
+def parse_range(text):
+    hands = {}
+    for term in text.replace(' ', '').split(','):
+        if term == '':
+            continue
+        weight = 1.0
+        if ':' in term:
+            term, weight = term.split(':', 1)
+            try:
+                weight = float(weight)
+            except ValueError:
+                raise InvalidRangeException(term)
+            if weight < 0:
+                raise InvalidRangeException(term)
+        if len(term) == 4 and term[1] in SUITS and term[3] in SUITS:
+            # A single specific hand like 'AsKd'
+            try:
+                first, second = cards(term)
+            except KeyError:
+                raise InvalidRangeException(term)
+            if first == second:
+                raise InvalidRangeException(term)
+            term_hands = [combo(first, second)]
+        else:
+            term_hands = []
+            for high, low, kind in range_classes(term):
+                term_hands += class_combos(high, low, kind)
+        for hand in term_hands:
+            hands[hand] = weight
+    hands = {hand: weight for hand, weight in hands.items() if weight > 0}
+    if len(hands) == 0:
+        raise InvalidRangeException(text)
+    return hands
+
+"""
+Returns a copy of a range without hands containing any of the dead Cards
+"""
+def remove_blocked(hands, dead):
+    dead = set(dead)
+    return {hand: weight for hand, weight in hands.items() if hand[0] not in dead and hand[1] not in dead}
+
+# All 52 cards as treys ints, built once
+DECK = tuple(Card.new(rank + suit) for rank in RANKS for suit in SUITS)
+# The 36 cards from 6 up
+SHORT_DECK_CARDS = tuple(Card.new(rank + suit) for rank in RANKS[4:] for suit in SUITS)
+
+class Deck:
+    """
+    A deck which is shuffled lazily, one card per draw, by running Fisher-Yates from the back
+    Only the cards actually dealt are ever randomized, and reshuffling just resets the count,
+    Since drawing from any arrangement of the cards is equally random
+    Indices come from source, an EntropyPool or SeededSource from Shuffle
+    """
+    __slots__ = ("cards", "remaining", "source")
+    def __init__(self, source=secure_source, cards=DECK):
+        self.cards = list(cards)
+        self.remaining = len(self.cards)
+        self.source = source
+
+    def shuffle(self):
+        self.remaining = len(self.cards)
+
+    def pop(self):
+        cards = self.cards
+        ind = self.source.randbelow(self.remaining)
+        last = self.remaining - 1
+        cards[ind], cards[last] = cards[last], cards[ind]
+        self.remaining = last
+        return cards[last]
+
+    def __len__(self):
+        return self.remaining
+
+def deck(source=secure_source):
+    shuffled = Deck(source)
+    return [shuffled.pop() for i in range(len(DECK))]
+
+class Variant:
+    """
+    Rules of one of the games a table can play
+    """
+    __slots__ = ("name", "hole_cards", "cards", "pot_limit", "evaluate_hands")
+    def __init__(self, name, hole_cards, cards, pot_limit, evaluate_hands):
+        self.name = name
+        self.hole_cards = hole_cards
+        # Cards in the deck
+        self.cards = cards
+        # Whether bets are capped at the size of the pot
+        self.pot_limit = pot_limit
+        # Function scoring a list of hands against a full board, like HandEvaluator.evaluate_hands
+        self.evaluate_hands = evaluate_hands
+
+HOLDEM = "holdem"
+OMAHA = "plo"
+SHORT_DECK = "shortdeck"
+VARIANTS = {
+    HOLDEM: Variant("No-Limit Hold'em", 2, DECK, False, evaluate_hands),
+    OMAHA: Variant("Pot-Limit Omaha", 4, DECK, True, evaluate_omaha_hands),
+    # Short deck ranks a flush above a full house and three of a kind above a straight
+    SHORT_DECK: Variant("Short Deck Hold'em", 2, SHORT_DECK_CARDS, False, evaluate_short_deck_hands)
+}
+
+class LegalActions:
+    """
+    The actions open to the acting seat and the bounds of its bet, computed once per decision point
+    Bets are totals for the street, like the chips passed to PokerGame.bet
+    Each game updates one instance in place as the action moves, so read it again after every action
+    """
+    __slots__ = ("seat", "check", "call", "bet", "call_amount", "min_bet", "max_bet", "pot")
     def __init__(self):
-        self.game_type = "No-Limit Hold'em"
-        # List of tuples of 2 cards like [AcAd, Ts9s, 5d2c] for all seats dealt in
-        self.hands = []
+        self.seat = None
+        self.check = False
+        self.call = False
+        self.bet = False
+        # Chips a call puts in, at most the seat's stack
+        self.call_amount = 0
+        # Smallest legal bet, the min raise or allin if the stack is short of it
+        self.min_bet = 0
+        # Allin, or a pot sized raise if that is smaller and the game is pot limit
+        self.max_bet = 0
+        # Chips in the pot and on the table once the acting seat has called, which a pot sized raise adds to the current bet
+        self.pot = 0
+
+class Positions:
+    """
+    Seats of a seat mask relative to the dealer, worked out once and looked up on every later hand
+    When the mask is the active seats, sb, bb and opener are the blinds and the first to act preflop
+    """
+    __slots__ = ("first", "order", "sb", "bb", "opener")
+    def __init__(self, seat_mask, dealer):
+        # Closest seat clockwise from the dealer, first to act after the flop and first to get odd chips
+        self.first = next_seat(seat_mask, dealer)
+        # Every seat clockwise from first
+        self.order = tuple(rotation(seat_mask, self.first))
+        if popcount(seat_mask) == 2:
+            self.sb = dealer
+            self.bb = next_seat(seat_mask, dealer)
+            self.opener = dealer
+        else:
+            self.sb = self.first
+            self.bb = next_seat(seat_mask, self.sb)
+            # UTG is 3 seats forward from the dealer
+            self.opener = next_seat(seat_mask, self.bb)
+
+# Positions by number of seats, each a dict keyed by seat_mask * seats + dealer and filled as masks are first seen
+POSITION_TABLES = {}
+
+def position_table(seats):
+    return POSITION_TABLES.setdefault(seats, {})
+
+class PokerGame:
+    # Precomputed heads-up preflop equities, memory mapped at startup, None if the table has not been built
+    preflop_table = load_preflop_table()
+    __slots__ = (
+        "game_type", "hands", "board", "deck", "headsup", "went_showdown",
+        "bb", "sb", "ante", "pot", "seats", "street", "initial_bet",
+        "chips_invested", "stacks", "current_bets", "occupied_mask",
+        "active_mask", "dealer", "previous_raise", "current_bet",
+        "remaining_mask", "acting_seat", "to_act_mask", "recent_winners",
+        "pots", "uncalled", "runout_mask", "runout_boards", "history", "legal", "legal_current", "position_table", "events", "rules"
+    )
+    # Attributes saved by snapshot, in order. The deck is saved separately, the recorder is not saved
+    # And the legal actions are recomputed on restore
+    SNAPSHOT_SLOTS = tuple(slot for slot in __slots__ if slot not in ("deck", "history", "legal", "legal_current", "position_table", "events", "rules"))
+    def __init__(self, seats=6, seed=None, variant=HOLDEM):
+        """_summary_
+        Args:
+            seats (int): number of seats at the table
+            seed (int): deal from a deterministic shuffle seeded with seed, for tests and replays
+                Games with no seed are shuffled from the secure entropy pool
+            variant (string): key of the game played in VARIANTS
+        """
+        self.rules = VARIANTS[variant]
+        self.game_type = self.rules.name
+        self.seats = seats
+        # List of tuples of holecards like [AcAd, Ts9s, 5d2c] indexed by seat, None for seats not dealt in
+        self.hands = [None for i in range(self.seats)]
         # List of cards on board, indices: flop = 0-2, turn = 3, river = 4
         self.board = []
-        self.deck = None
+        self.deck = Deck(secure_source if seed is None else SeededSource(seed), self.rules.cards)
         self.headsup = False
         self.went_showdown = False
         self.bb = 2
         self.sb = 1
         self.ante = 0
         self.pot = 0
-        self.seats = 6
         self.street = Streets.End
         # Whether or not the next bet on the current street will have been the first bet
         # Ex: preflop the initial bet is the open raise
@@ -98,29 +376,120 @@ class PokerGame:
         # Chips placed into the pot from each player on current betting round
         self.current_bets = [0 for i in range(self.seats)]
         # Seats which contain a player but are not necessarily bought in or sitting in
-        self.occupied_seats = []
+        self.occupied_mask = 0
         # Seats which are bought in and not sitting out
-        self.active_seats = []
+        self.active_mask = 0
         # Seat with the dealer button
         self.dealer = None
         self.previous_raise = 0
         # Current bet placed by the most recent player
         self.current_bet = 0
         # Seats which still have hands in play
-        self.remaining_hands = []
-        # List of seats yet to act, in order
-        self.action_permissions = []
+        self.remaining_mask = 0
+        # Seat of the player whose action it currently is
+        self.acting_seat = None
+        # Seats yet to act on the current betting round, including the acting seat
+        self.to_act_mask = 0
+        self.recent_winners = []
+        # List of tuples (chips, eligible_mask) for the main pot and side pots, as of the start of the current street
+        self.pots = []
+        # Tuple (seat, chips) of chips bet by the deepest player which no one else could call
+        self.uncalled = None
+        # Seats which were allin, and the board at the allin and at each later street before the river,
+        # If the current hand was run out without further action
+        self.runout_mask = 0
+        self.runout_boards = []
+        # Recorder of every event of each hand, like a HandLog, or None when hands are not recorded
+        self.history = None
+        # LegalActions of the acting seat, and whether they are up to date with the action
+        self.legal = LegalActions()
+        self.legal_current = False
+        # Positions of seat masks around each dealer, shared by every game with this many seats
+        self.position_table = position_table(seats)
+        # EventStream delivering events to subscribers, None when there are none
+        self.events = None
+
+    # Deliver every event of each hand to callback(event), see Events
+    # Subscribe after setting history, since the events are published through it
+    def subscribe(self, callback):
+        if self.events is None:
+            self.events = EventStream(self.history)
+            self.history = self.events if self.history is None else Recorders(self.history, self.events)
+        self.events.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self.events.subscribers.remove(callback)
+        if len(self.events.subscribers) == 0:
+            self.history = self.events.previous
+            self.events = None
+
+    @property
+    def occupied_seats(self):
+        return mask_seats(self.occupied_mask)
+
+    @property
+    def active_seats(self):
+        return mask_seats(self.active_mask)
+
+    @property
+    def remaining_hands(self):
+        return mask_seats(self.remaining_mask)
+
+    # List of seats yet to act, in order
+    @property
+    def action_permissions(self):
+        if self.to_act_mask == 0:
+            return []
+        return rotation(self.to_act_mask, self.acting_seat)
+
+    def snapshot(self):
+        """_summary_
+        Capture the full state of the game, including a hand in progress, as builtin types only
+        So it serializes compactly and does not depend on the classes of this module
+        Returns:
+            tuple: values of SNAPSHOT_SLOTS, then the deck's cards and the number not yet dealt
+        """
+        state = [getattr(self, slot) for slot in PokerGame.SNAPSHOT_SLOTS]
+        state[PokerGame.SNAPSHOT_SLOTS.index("street")] = self.street.value
+        return tuple(state) + (self.deck.cards, self.deck.remaining)
+
+    @classmethod
+    def restore(cls, state):
+        """_summary_
+        Rebuild a game from snapshot, dealing the rest of any hand in progress from the secure shuffle
+        Returns:
+            PokerGame: the restored game
+        """
+        game_type = state[PokerGame.SNAPSHOT_SLOTS.index("game_type")]
+        variant = next(key for key, rules in VARIANTS.items() if rules.name == game_type)
+        game = cls(state[PokerGame.SNAPSHOT_SLOTS.index("seats")], variant=variant)
+        for slot, value in zip(PokerGame.SNAPSHOT_SLOTS, state):
+            setattr(game, slot, value)
+        game.street = Streets(game.street)
+        game.deck.cards = list(state[-2])
+        game.deck.remaining = state[-1]
+        return game
 
     """
-    Return list of winning seats given all holecards and board for live hands
+    Return dict of seat -> score for all live hands, scored against the board in a single pass
     """
-    def winners(self):
+    def score_hands(self):
         if self.street != Streets.River:
             raise InvalidShowdownException()
-        live_hands = [(seat, hand) for seat, hand in enumerate(self.hands) if seat in self.remaining_hands]
-        scores = [PokerGame.evaluator.evaluate(tuple(hand), tuple(self.board)) for seat, hand in live_hands]
-        min_score = min(scores)
-        winners = [seat for ((seat, hand), score) in zip(live_hands, scores) if score == min_score]
+        live_seats = mask_seats(self.remaining_mask)
+        scores = self.rules.evaluate_hands([self.hands[seat] for seat in live_seats], self.board)
+        return dict(zip(live_seats, scores))
+
+    """
+    Return list of winning seats given all holecards and board for live hands
+    Scores may be passed in from score_hands to avoid evaluating the hands again
+    """
+    def winners(self, scores=None):
+        if scores is None:
+            scores = self.score_hands()
+        live_seats = mask_seats(self.remaining_mask)
+        min_score = min(scores[seat] for seat in live_seats)
+        winners = [seat for seat in live_seats if scores[seat] == min_score]
         return winners
 
     # Invest chips from stack of seat into the pot, as a bet or a call
@@ -129,229 +498,237 @@ class PokerGame:
         self.chips_invested[seat] += chips
         self.stacks[seat] -= chips
 
+    # Returns the Positions of a seat mask around the current dealer
+    def positions(self, seat_mask):
+        key = seat_mask * self.seats + self.dealer
+        positions = self.position_table.get(key)
+        if positions is None:
+            positions = self.position_table[key] = Positions(seat_mask, self.dealer)
+        return positions
+
     # Determine if seat is blind and should be able to place a bet
     # Even though they've already put out a blind bet
     def is_blind(self, seat):
         if self.street != Streets.Preflop:
             return False
-        
-        num_active = len(self.active_seats)
-        dealer_ind = self.active_seats.index(self.dealer)
-        heads_up = num_active == 2
-        if heads_up:
-            sb_ind = dealer_ind
-            bb_ind = dealer_ind + 1
-        else:
-            sb_ind = dealer_ind + 1
-            bb_ind = dealer_ind + 2
 
-        sb_ind %= num_active
-        bb_ind %= num_active
-        sb = self.active_seats[sb_ind]
-        bb = self.active_seats[bb_ind]
+        positions = self.positions(self.active_mask)
+        sb = positions.sb
+        bb = positions.bb
         is_sb = seat == sb
         if is_sb:
             return self.current_bets[sb] == self.sb
         is_bb = seat == bb
         if is_bb:
             return self.current_bets[bb] == self.bb
-        
+
         return False
 
     def buyin(self, seat, stack):
-        if seat in self.occupied_seats:
-            raise SeatOccupiedException()
         if seat >= self.seats or seat < 0:
             raise InvalidSeatException()
+        if self.occupied_mask & seat_bit(seat):
+            raise SeatOccupiedException()
         self.stacks[seat] = stack
-        inorder_append(self.occupied_seats, seat)
+        self.occupied_mask |= seat_bit(seat)
 
     def addon(self, seat, amount):
-        if not (seat in self.occupied_seats):
+        if not (self.occupied_mask & seat_bit(seat)):
             raise SeatNotOccupiedException()
         self.stacks[seat] += amount
+        self.legal_current = False
 
     def sitin(self, seat):
-        if not (seat in self.occupied_seats):
+        if not (self.occupied_mask & seat_bit(seat)):
             raise SeatNotOccupiedException()
         if self.stacks[seat] == 0:
             raise NoChipsException()
-        if seat in self.active_seats:
+        if self.active_mask & seat_bit(seat):
             raise InvalidSitInException()
-        inorder_append(self.active_seats, seat)
+        self.active_mask |= seat_bit(seat)
 
     def hand_running(self):
         return self.street != Streets.End
     
     def rotate_dealer(self):
-        next_dealer = self.first_to_act(self.active_seats)
+        next_dealer = self.first_to_act(self.active_mask)
         self.dealer = next_dealer
 
     def sitout(self, seat):
-        if seat not in self.occupied_seats:
+        bit = seat_bit(seat)
+        if not (self.occupied_mask & bit):
             raise SeatNotOccupiedException()
-        if (seat not in self.active_seats) or (seat in self.remaining_hands):
+        if not (self.active_mask & bit) or (self.remaining_mask & bit):
             raise InvalidSitOutException()
-        self.active_seats.remove(seat)
-        if len(self.active_seats) == 1:
+        self.active_mask &= ~bit
+        if popcount(self.active_mask) == 1:
             self.dealer = None
 
     def cashout(self, seat):
-        if seat not in self.occupied_seats:
+        bit = seat_bit(seat)
+        if not (self.occupied_mask & bit):
             raise SeatNotOccupiedException()
-        if seat in self.active_seats:
+        if self.active_mask & bit:
             self.sitout(seat)
         stack = self.stacks[seat]
-        self.occupied_seats.remove(seat)
+        self.occupied_mask &= ~bit
         self.stacks[seat] = 0
         return stack
 
     # Returns number of players with hands remaining in play
     def num_remaining(self):
-        return len(self.remaining_hands)
+        return popcount(self.remaining_mask)
     
     def deal(self):
-        self.deck = deck()
+        self.deck.shuffle()
+        self.legal_current = False
         self.pot = 0
         self.current_bet = self.bb
         self.initial_bet = True
         self.previous_raise = self.bb
-        self.current_bets = [0 for i in range(self.seats)]
-        self.chips_invested = [0 for i in range(self.seats)]
-        self.hands.clear()
-        self.board.clear()
+        pop = self.deck.pop
+        hole_cards = self.rules.hole_cards
         for seat in range(self.seats):
-            if seat in self.active_seats:
-                hand = (self.deck.pop(), self.deck.pop())
-                self.hands.append(hand)
+            self.current_bets[seat] = 0
+            self.chips_invested[seat] = 0
+            if self.active_mask & seat_bit(seat):
+                if hole_cards == 2:
+                    self.hands[seat] = (pop(), pop())
+                else:
+                    self.hands[seat] = tuple(pop() for card in range(hole_cards))
             else:
-                self.hands.append(None)
+                self.hands[seat] = None
+        self.board.clear()
+        self.pots.clear()
+        self.uncalled = None
+        self.runout_mask = 0
+        self.runout_boards.clear()
 
-        self.remaining_hands = [seat for seat in self.active_seats]
+        self.remaining_mask = self.active_mask
         if self.num_remaining() < 2:
             # Need to allow players to sit out if a hand is an invalid deal, so
             # Clear remaining hands
-            self.remaining_hands.clear()
+            self.remaining_mask = 0
             raise NoPlayersException()
         if self.dealer == None:
-            self.dealer = random.sample(self.active_seats, 1)[0]
+            active_seats = self.active_seats
+            self.dealer = active_seats[self.deck.source.randbelow(len(active_seats))]
         else:
             self.rotate_dealer()
         self.street = Streets.Preflop
-        if self.num_remaining() == 2:
-            self.headsup = True
-            self.deal_headsup()
-        else:
-            self.headsup = False
-            self.deal_ring()
-
-    def open_action(self, seat_ind, include_final=False):
-        if not include_final:
-            if seat_ind == 0:
-                seats = self.remaining_hands[0:len(self.remaining_hands)-1]
-            else:
-                seats = self.remaining_hands[seat_ind:] + self.remaining_hands[:seat_ind-1]
-        else:
-            seats = self.remaining_hands[seat_ind:] + self.remaining_hands[:seat_ind]
-        self.action_permissions.clear()
-        for seat in seats:
-            self.action_permissions.append(seat)
-
-    def deal_headsup(self):
-        dealer_ind = self.active_seats.index(self.dealer)
-        self.open_action(dealer_ind, include_final=True)
-        sb_ind = dealer_ind
-        bb_ind = (dealer_ind + 1) % 2
-        sb_seat = self.active_seats[sb_ind]
-        bb_seat = self.active_seats[bb_ind]
+        if self.history is not None:
+            self.history.begin(self)
+        self.headsup = self.num_remaining() == 2
+        positions = self.positions(self.active_mask)
+        self.open_action(positions.opener)
+        self.post_blinds(positions.sb, positions.bb)
+
+    # Give action to seat, with every remaining hand yet to act on the current round
+    # Except for the closing seat, which has already acted on the current bet
+    def open_action(self, seat, closing_seat=None):
+        self.to_act_mask = self.remaining_mask
+        if closing_seat is not None:
+            self.to_act_mask &= ~seat_bit(closing_seat)
+        self.acting_seat = seat
+
+    def post_blinds(self, sb_seat, bb_seat):
         sb_stack = self.stacks[sb_seat]
         bb_stack = self.stacks[bb_seat]
-
+        # If the BB cannot pay 1 chip more than the ante, they will be forced to sit out
         after_ante = bb_stack - self.ante
         if after_ante < 1:
-            self.remaining_hands.clear()
+            self.remaining_mask = 0
             raise ShortStackException()
-        
-        sb = min(self.sb, sb_stack)
-        bb = min(self.bb, bb_stack)
-        self.stacks[bb_seat] -= self.ante
-        self.pot += self.ante
-        self.invest(bb_seat, bb)
-        self.invest(sb_seat, sb)
-
-    def deal_ring(self):
-        # Index of dealer
-        dealer_ind = self.active_seats.index(self.dealer)
-        # Index of UTG is 3 forward
-        utg_ind = (dealer_ind + 3) % self.num_remaining()
-        self.open_action(utg_ind, include_final=True)
 
-        sb_ind = (dealer_ind + 1) % self.num_remaining()
-        sb_seat = self.active_seats[sb_ind]
-        sb_stack = self.stacks[sb_seat]
         sb = min(self.sb, sb_stack)
-        # If the BB cannot pay 1 chip more than the ante, they will be forced to sit out
-        bb_ind = (dealer_ind + 2) % self.num_remaining()
-        bb_seat = self.active_seats[bb_ind]
-        bb_stack = self.stacks[bb_seat]
-        after_ante = bb_stack - self.ante
-        if after_ante < 1:
-            self.remaining_hands.clear()
-            raise ShortStackException()
-        bb = min(self.bb, bb_stack)
+        bb = min(self.bb, after_ante)
         self.stacks[bb_seat] -= self.ante
         self.pot += self.ante
         self.invest(bb_seat, bb)
         self.invest(sb_seat, sb)
-        
+        if self.history is not None:
+            self.history.record(POST, bb_seat, self.ante + bb)
+            self.history.record(POST, sb_seat, sb)
+
     def fold(self):
-        acting_player = self.action_permissions[0]
+        acting_player = self.acting_seat
+        if self.history is not None:
+            self.history.record(FOLD, acting_player)
         # Remove the player's bets from the bet pool and add it to the pot
         self.pot += self.current_bets[acting_player]
         self.current_bets[acting_player] = 0
-        # Remove the acting player's seat from the remaining hands list of active seats
-        self.remaining_hands.remove(acting_player)
+        # Remove the acting player's seat from the remaining hands
+        self.remaining_mask &= ~seat_bit(acting_player)
         self.action_forward()
 
+    # Returns the LegalActions of the acting seat, computed at most once each time the action moves,
+    # Or None if no one is to act
+    def legal_actions(self):
+        legal_actions = self.legal
+        if self.legal_current:
+            return legal_actions
+        if self.remaining_mask == 0:
+            return None
+        acting_player = self.acting_seat
+        current_bets = self.current_bets
+        current_bet = self.current_bet
+        previous_raise = self.previous_raise
+        player_bet = current_bets[acting_player]
+        stack = self.stacks[acting_player]
+        difference = current_bet - player_bet
+        legal_actions.seat = acting_player
+        legal_actions.check = difference == 0
+        legal_actions.call = difference != 0
+        # The initial ability to bet on a given street is always granted
+        legal_actions.bet = self.initial_bet or difference >= previous_raise or self.is_blind(acting_player)
+        legal_actions.call_amount = stack if stack < difference else difference
+        max_bet = player_bet + stack
+        # Any bet over the current bet which puts the player allin is allowed, even short of a min raise
+        min_bet = current_bet + previous_raise
+        if max_bet < min_bet:
+            min_bet = max_bet if max_bet > current_bet else current_bet + 1
+        pot = self.pot + sum(current_bets) + difference
+        if self.rules.pot_limit and current_bet + pot < max_bet:
+            # A pot sized raise calls and then raises by the whole pot
+            max_bet = current_bet + pot
+            if max_bet < min_bet:
+                min_bet = max_bet
+        legal_actions.max_bet = max_bet
+        legal_actions.min_bet = min_bet
+        legal_actions.pot = pot
+        self.legal_current = True
+        return legal_actions
+
     # Determine whether the current acting player is able to initiate a new bet
     def may_bet(self):
-        # The initial ability to bet on a given street is always granted
-        if self.initial_bet:
-            return True
-        acting_player = self.action_permissions[0]
-        difference = self.current_bet - self.current_bets[acting_player]
-        action_open = difference >= self.previous_raise
-        
-        return action_open or self.is_blind(acting_player)
+        legal_actions = self.legal_actions()
+        return legal_actions is not None and legal_actions.bet
     
     # Determine whether the current acting player has chips remaining to take an action
     def may_act(self):
-        acting_player = self.action_permissions[0]
-        return self.stacks[acting_player] != 0
+        return self.stacks[self.acting_seat] != 0
 
     def bet(self, chips):
         if not self.may_bet():
             raise InvalidBetException()
         # Seat number of currently acting player
-        acting_player = self.action_permissions[0]
-        # Bets must be made with positive integer quantities, and bets must exceed the current bet
-        if (chips % 1) != 0 or chips <= 0 or chips <= self.current_bet:
+        acting_player = self.acting_seat
+        # Bets must be made with integer quantities, and must be a legal raise or put the player allin
+        if (chips % 1) != 0 or chips < self.legal.min_bet:
+            raise InvalidBetException()
+        if self.rules.pot_limit and chips > self.legal.max_bet:
             raise InvalidBetException()
         player_previous_bet = self.current_bets[acting_player]
         additional_chips = chips - player_previous_bet
         # A player should not bet more additional chips than they have in their stack
         additional_chips = min(self.stacks[acting_player], additional_chips)
-        raise_req = self.current_bet + self.previous_raise
-        legal_raise = chips >= raise_req
-        allin = additional_chips >= self.stacks[acting_player]
-        # If the bet is less than allin, and the bet is not a legal raise, then
-        # Is an invalid bet
-        if not (legal_raise or allin):
-            raise InvalidBetException()
+        legal_raise = chips >= self.current_bet + self.previous_raise
         if legal_raise:
             self.previous_raise = chips - self.current_bet
         self.initial_bet = False
         self.current_bet = chips
+        if self.history is not None:
+            self.history.record(BET, acting_player, chips)
         self.invest(acting_player, additional_chips)
         self.action_forward(reopen=True)
 
@@ -360,11 +737,12 @@ class PokerGame:
         self.current_bet = 0
         self.previous_raise = self.bb
         self.initial_bet = True
-        for bet in self.current_bets:
-            self.pot += bet
-        self.current_bets = [0 for i in range(self.seats)]
-        first_to_act = self.first_to_act(self.remaining_hands)
-        self.open_action(first_to_act, include_final=True)
+        for seat in range(self.seats):
+            self.pot += self.current_bets[seat]
+            self.current_bets[seat] = 0
+        self.collect_pots()
+        first_to_act = self.first_to_act(self.remaining_mask)
+        self.open_action(first_to_act)
 
         match (self.street):
             case Streets.Preflop:
@@ -381,11 +759,17 @@ class PokerGame:
                 self.showdown()
                 # Each player who has gone broke during the hand will automatically sit out
                 self.street = Streets.End
-                for seat in self.active_seats:
+                for seat in mask_seats(self.active_mask):
                     if self.stacks[seat] == 0:
                         self.sitout(seat)
+                if self.history is not None:
+                    self.history.end(self)
                 return
         self.street = next
+        if self.history is not None:
+            self.history.record_cards(STREET, next.value, self.board[-3:] if next == Streets.Flop else self.board[-1:])
+        if len(self.runout_boards) != 0 and next != Streets.River:
+            self.runout_boards.append(tuple(self.board))
 
         # If first to act is already allin, 
         # Move the action forward to the next player who may act
@@ -394,138 +778,166 @@ class PokerGame:
 
     # Determine if all players remaining in the hand are allin
     def players_allin(self):
-        not_allin = []
-        for seat in self.remaining_hands:
+        not_allin = None
+        mask = self.remaining_mask
+        while mask:
+            low = mask & -mask
+            mask ^= low
+            seat = low.bit_length() - 1
             if self.stacks[seat] != 0:
-                not_allin.append(seat)
-                if len(not_allin) == 2:
+                if not_allin is not None:
                     return False
+                not_allin = seat
         # If there is one player not allin, he must have called the largest allin bet
         # In order for the hand to be currently allin
-        if len(not_allin) == 1:
+        if not_allin is not None:
             largest_invested = max(self.chips_invested)
-            seat = not_allin[0]
-            player_invested = self.chips_invested[seat]
+            player_invested = self.chips_invested[not_allin]
             if player_invested < largest_invested:
                 return False
         return True
 
+    """
+    Split chips_invested into the main pot and side pots, in one sweep from the smallest investment to the largest
+    Each pot is a tuple (chips, eligible_mask) of the chips in the pot and the live seats who may win it, main pot first
+    Chips which only the deepest player put in were never called, and are kept aside in uncalled as (seat, chips)
+    """
+    def collect_pots(self):
+        invested = sorted((chips, seat) for seat, chips in enumerate(self.chips_invested) if chips > 0)
+        pots = []
+        self.uncalled = None
+        # Seats who have no chips invested in a pot cannot win it
+        eligible_mask = self.remaining_mask
+        for seat in range(self.seats):
+            if self.chips_invested[seat] == 0:
+                eligible_mask &= ~seat_bit(seat)
+        previous_level = 0
+        for ind, (level, seat) in enumerate(invested):
+            contributors = len(invested) - ind
+            if level > previous_level:
+                chips = (level - previous_level) * contributors
+                if contributors == 1:
+                    self.uncalled = (seat, chips)
+                elif pots and pots[-1][1] == eligible_mask:
+                    # Chips from folded players do not form a pot of their own
+                    pots[-1] = (pots[-1][0] + chips, eligible_mask)
+                else:
+                    pots.append((chips, eligible_mask))
+                previous_level = level
+            eligible_mask &= ~seat_bit(seat)
+        # The winner of the main pot is always awarded the ante
+        if pots:
+            pots[0] = (pots[0][0] + self.ante, pots[0][1])
+        self.pots = pots
+
+    """
+    Return list of tuples (chips, eligible seats) for the main pot and each side pot, for live seats only
+    """
+    def pot_structure(self):
+        return [(chips, mask_seats(eligible_mask & self.remaining_mask)) for chips, eligible_mask in self.pots]
+
     def showdown(self):
-        # Ordered list of tuples (seat, chips_invested) sorted by chips_invested
-        invested = [(seat, chips) for (seat, chips) in enumerate(self.chips_invested)]
-        # Sort chips_invested by number of chips, from least to greatest
-        invested = sorted(invested, key=lambda data: data[1])
-        first_pot = True
-        # Shitty algorithm for calculating sidepots
-        while True:
-            should_break = False
-            # Calculating next side pot, ignore all seats who have 0 chips invested
-            while invested[0][1] == 0:
-                curr_seat = invested[0][0]
-                # Players who have no chips invested in subsequent pots should not be included as possible winners for those pots
-                if curr_seat in self.remaining_hands:
-                    self.remaining_hands.remove(curr_seat)
-                invested.pop(0)
-                if len(invested) == 1:
-                    # If only one person remains after removing all people with no chips invested,
-                    # Then stop calculating sidepots
-                    should_break = True
-                    break
-            if should_break:
-                break
-            curr_chips_req = invested[0][1]
-            curr_pot = curr_chips_req * len(invested)
-            curr_pot_winners = self.winners()
-            # The winner of the main pot is always awarded the ante
-            if first_pot:
-                curr_pot += self.ante
-                first_pot = False
-                self.recent_winners = curr_pot_winners
-            for i in range(len(invested)):
-                curr_seat, curr_chips = invested[i]
-                invested[i] = curr_seat, curr_chips - curr_chips_req
-            num_winners = len(curr_pot_winners)
-            for winner in curr_pot_winners:
-                self.stacks[winner] += curr_pot // num_winners
-            remainder = curr_pot % num_winners
+        # Every live hand is scored once, and each pot is paid to the best scores among its eligible seats
+        scores = self.score_hands()
+        for ind, (chips, eligible_mask) in enumerate(self.pots):
+            eligible = mask_seats(eligible_mask)
+            best_score = min(scores[seat] for seat in eligible)
+            winner_mask = 0
+            for seat in eligible:
+                if scores[seat] == best_score:
+                    winner_mask |= seat_bit(seat)
+            winners = mask_seats(winner_mask)
+            if ind == 0:
+                self.recent_winners = winners
+            share, remainder = divmod(chips, len(winners))
+            for winner in winners:
+                self.stacks[winner] += share
+                if self.history is not None:
+                    self.history.record(PAYOUT, winner, share)
             # The remainder is distributed with priority going to the small blind,
             # Rotating clockwise
-            minimum_seat = self.first_to_act(curr_pot_winners)
-            minimum_ind = curr_pot_winners.index(minimum_seat)
-
-            for chip in range(remainder):
-                curr_ind = (minimum_ind + chip) % num_winners
-                self.stacks[curr_pot_winners[curr_ind]] += 1
+            odd_chip_order = self.positions(winner_mask).order
+            for seat in odd_chip_order[:remainder]:
+                self.stacks[seat] += 1
+                if self.history is not None:
+                    self.history.record(PAYOUT, seat, 1)
 
         # Return extra chips to deep stacked player's stack
-        final_seat, extra_chips = invested[0]
-        self.stacks[final_seat] += extra_chips
+        if self.uncalled is not None:
+            final_seat, extra_chips = self.uncalled
+            self.stacks[final_seat] += extra_chips
+            if self.history is not None:
+                self.history.record(RETURN, final_seat, extra_chips)
         # No hands are remaining in play now
         self.went_showdown = True
-        self.remaining_hands.clear()
-
-    def first_to_act(self, seats):
-        if len(seats) == 1:
-            return seats[0]
-        if self.headsup:
-            return seats[0] if self.dealer == seats[1] else seats[1]
-        # Weird modulus algorithm to find seat closest to SB
-        minimum_seat = None
-        minimum = None
-        for seat in seats:
-            adjusted = seat
-            if adjusted > self.dealer:
-                adjusted -= self.seats
-            if minimum == None:
-                minimum_seat, minimum = seat, adjusted
-                continue
-            if adjusted < minimum:
-                minimum_seat, minimum = seat, adjusted
-        return minimum_seat
+        self.remaining_mask = 0
+
+    # Returns the seat in the mask closest to the small blind, rotating clockwise from the dealer
+    def first_to_act(self, seat_mask):
+        return self.positions(seat_mask).first
 
     def action_forward(self, reopen=False):
+        self.legal_current = False
         if self.num_remaining() == 1:
-            remaining_player = self.remaining_hands[0]
-            self.stacks[remaining_player] += self.pot + sum(self.current_bets)
-            self.remaining_hands.clear()
+            remaining_player = lowest_seat(self.remaining_mask)
+            winnings = self.pot + sum(self.current_bets)
+            self.stacks[remaining_player] += winnings
+            self.remaining_mask = 0
+            self.to_act_mask = 0
             self.recent_winners = [remaining_player]
             self.went_showdown = False
             self.street = Streets.End
+            if self.history is not None:
+                self.history.record(PAYOUT, remaining_player, winnings)
+                self.history.end(self)
             return
 
-        # Remove the most recent actor from the action sequence, and get their seat number
-        previous_actor = self.action_permissions.pop(0)
+        # Remove the most recent actor from the action sequence
+        previous_actor = self.acting_seat
+        self.to_act_mask &= ~seat_bit(previous_actor)
         if reopen:
-            actor_ind = self.remaining_hands.index(previous_actor)
-            next_ind = (actor_ind + 1) % self.num_remaining()
-            self.open_action(next_ind)
+            next_actor = next_seat(self.remaining_mask, previous_actor)
+            self.open_action(next_actor, closing_seat=previous_actor)
+        elif self.to_act_mask:
+            self.acting_seat = next_seat(self.to_act_mask, previous_actor)
         # If there are players left to act, skip the actions for players who are already allin
-        while (len(self.action_permissions) != 0) and (not self.may_act()):
-            self.action_permissions.pop(0)
+        while self.to_act_mask and not self.may_act():
+            self.to_act_mask &= ~seat_bit(self.acting_seat)
+            if self.to_act_mask:
+                self.acting_seat = next_seat(self.to_act_mask, self.acting_seat)
         # If no players are left, or the hand is allin, move to the next street
-        if len(self.action_permissions) == 0 or self.players_allin():
+        allin = self.players_allin()
+        if allin and len(self.runout_boards) == 0 and self.street != Streets.River:
+            # The rest of the board will be run out without further action
+            self.runout_mask = self.remaining_mask
+            self.runout_boards.append(tuple(self.board))
+        if self.to_act_mask == 0 or allin:
             self.next_street()
 
     def may_call(self):
-        return not self.may_check()
+        legal_actions = self.legal_actions()
+        return legal_actions is not None and legal_actions.call
 
     def call(self):
         if not self.may_call():
             raise InvalidCallException()
-        acting_player = self.action_permissions[0]
-        difference = self.current_bet - self.current_bets[acting_player]
+        acting_player = self.acting_seat
         # Players may call off their stack and no more
-        investment = min(self.stacks[acting_player], difference)
+        investment = self.legal.call_amount
+        if self.history is not None:
+            self.history.record(CALL, acting_player, investment)
         self.invest(acting_player, investment)
         self.action_forward()
     
     def may_check(self):
-        acting_player = self.action_permissions[0]
-        return self.current_bets[acting_player] == self.current_bet
+        legal_actions = self.legal_actions()
+        return legal_actions is not None and legal_actions.check
     
     def check(self):
         if not self.may_check():
             raise InvalidCheckException()
+        if self.history is not None:
+            self.history.record(CHECK, self.acting_seat)
         self.action_forward()
 
 if __name__ == '__main__':
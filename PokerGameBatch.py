@@ -0,0 +1,545 @@
+import sys
+import time
+import numpy as np
+from Equity import summarize, score_cards
+from PokerGame import PokerGame, next_seat, Streets, NoPlayersException, ShortStackException
+from HandHistory import INDEX_CARDS
+from Replay import RecordedDeck
+
+"""
+Many No-Limit Hold'em tables stepped in lockstep, with the state of every table held in one
+NumPy structured array and every rule applied to all tables at once
+
+The rules are those of PokerGame, down to its quirks (a bet sets the current bet to the amount
+Named even when the player is allin for less, busted players only sit out after a showdown...),
+So the two engines can be run side by side on the same cards and actions and compared after
+Every step. Run the comparison with:
+    python PokerGameBatch.py [tables] [hands] [seats]
+
+Cards are indices 0-51 (rank * 4 + suit) as in Equity. Actions are given per table as a kind
+(NONE, FOLD, CHECK, CALL, BET) and an amount, the total bet for BET. Illegal actions are not
+Raised like PokerGame's exceptions, they leave the table unchanged and are reported as INVALID.
+"""
+
+NONE, FOLD, CHECK, CALL, BET = range(5)
+OK, INVALID, NO_PLAYERS, SHORT_STACK = range(4)
+PREFLOP, FLOP, TURN, RIVER, END = (street.value for street in Streets)
+NO_SCORE = np.iinfo(np.int32).max
+
+def table_dtype(seats):
+    return np.dtype([
+        ("stacks", "i8", (seats,)),
+        ("current_bets", "i8", (seats,)),
+        ("chips_invested", "i8", (seats,)),
+        ("hands", "i1", (seats, 2)),
+        ("board", "i1", (5,)),
+        ("board_count", "i1"),
+        ("street", "i1"),
+        ("pot", "i8"),
+        ("current_bet", "i8"),
+        ("previous_raise", "i8"),
+        ("initial_bet", "?"),
+        ("went_showdown", "?"),
+        ("dealer", "i1"),
+        ("acting_seat", "i1"),
+        ("to_act_mask", "i4"),
+        ("remaining_mask", "i4"),
+        ("active_mask", "i4"),
+        ("sb", "i8"),
+        ("bb", "i8"),
+        ("ante", "i8")
+    ])
+
+def next_seat_table(seats):
+    """_summary_
+    next_seat of every seat mask and seat, indexed [mask, seat]
+    """
+    table = np.full((1 << seats, seats), -1, dtype=np.int64)
+    for mask in range(1, 1 << seats):
+        for seat in range(seats):
+            table[mask, seat] = next_seat(mask, seat)
+    return table
+
+class PokerGameBatch:
+    def __init__(self, tables, seats=6, sb=1, bb=2, ante=0, seed=None):
+        """_summary_
+        Args:
+            tables (int): number of tables
+            seats (int): seats at every table
+            sb (int): small blind
+            bb (int): big blind
+            ante (int): ante, posted by the big blind
+            seed (int): seed for shuffling and for choosing the first dealer
+        """
+        self.tables = tables
+        self.seats = seats
+        self.state = np.zeros(tables, dtype=table_dtype(seats))
+        self.state["street"] = END
+        self.state["dealer"] = -1
+        self.state["acting_seat"] = -1
+        self.state["sb"] = sb
+        self.state["bb"] = bb
+        self.state["ante"] = ante
+        self.rng = np.random.default_rng(seed)
+        self.next = next_seat_table(seats)
+        self.popcount = np.array([mask.bit_count() for mask in range(1 << seats)])
+        self.bits = 1 << np.arange(seats)
+
+    def field(self, name):
+        return self.state[name]
+
+    def seat_mask(self, seats_present):
+        return (seats_present * self.bits).sum(axis=-1)
+
+    def sit(self, stacks, tables=None):
+        """_summary_
+        Set the stacks of tables, seating every seat with chips and leaving the rest empty
+        Args:
+            stacks (ndarray): shape (tables, seats) stacks
+            tables (ndarray): indices of the tables to set, defaults to all
+        """
+        tables = np.arange(self.tables) if tables is None else np.asarray(tables)
+        self.state["stacks"][tables] = stacks
+        self.state["active_mask"][tables] = self.seat_mask(np.asarray(stacks) > 0)
+
+    def hand_running(self):
+        return self.state["street"] != END
+
+    def invest(self, tables, seats, chips):
+        self.state["current_bets"][tables, seats] += chips
+        self.state["chips_invested"][tables, seats] += chips
+        self.state["stacks"][tables, seats] -= chips
+
+    def deal(self, tables=None, cards=None):
+        """_summary_
+        Deal a hand at tables, moving the button and posting blinds and antes
+        Args:
+            tables (ndarray): indices of the tables to deal, defaults to every table without a hand running
+            cards (ndarray): shape (tables, 2 * seats + 5) card indices, holecards of each seat then the board,
+                Shuffled if not given
+
+        Returns:
+            ndarray: OK, NO_PLAYERS or SHORT_STACK for each table dealt
+        """
+        st = self.state
+        seats = self.seats
+        tables = np.flatnonzero(st["street"] == END) if tables is None else np.asarray(tables)
+        count = len(tables)
+        if cards is None:
+            cards = np.argpartition(self.rng.random((count, 52)), 2 * seats + 4, axis=1)[:, :2 * seats + 5]
+        status = np.full(count, OK)
+        st["pot"][tables] = 0
+        st["current_bet"][tables] = st["bb"][tables]
+        st["initial_bet"][tables] = True
+        st["previous_raise"][tables] = st["bb"][tables]
+        st["current_bets"][tables] = 0
+        st["chips_invested"][tables] = 0
+        st["hands"][tables] = cards[:, :2 * seats].reshape(count, seats, 2)
+        st["board"][tables] = cards[:, 2 * seats:]
+        st["board_count"][tables] = 0
+
+        active = st["active_mask"][tables]
+        players = self.popcount[active]
+        st["remaining_mask"][tables] = np.where(players < 2, 0, active)
+        status[players < 2] = NO_PLAYERS
+        dealt = players >= 2
+        tables, active, players = tables[dealt], active[dealt], players[dealt]
+
+        dealer = st["dealer"][tables].astype(np.int64)
+        placed = dealer >= 0
+        dealer[placed] = self.next[active[placed], dealer[placed]]
+        for ind in np.flatnonzero(~placed):
+            # As in PokerGame, a table with no button yet gets one at random
+            dealer[ind] = self.rng.choice(np.flatnonzero(active[ind] & self.bits))
+        st["dealer"][tables] = dealer
+        st["street"][tables] = PREFLOP
+
+        headsup = players == 2
+        sb_seat = np.where(headsup, dealer, self.next[active, dealer])
+        bb_seat = self.next[active, sb_seat]
+        st["acting_seat"][tables] = np.where(headsup, sb_seat, self.next[active, bb_seat])
+        st["to_act_mask"][tables] = active
+
+        after_ante = st["stacks"][tables, bb_seat] - st["ante"][tables]
+        short = after_ante < 1
+        st["remaining_mask"][tables[short]] = 0
+        status[np.flatnonzero(dealt)[short]] = SHORT_STACK
+        tables, sb_seat, bb_seat, after_ante = tables[~short], sb_seat[~short], bb_seat[~short], after_ante[~short]
+        sb = np.minimum(st["sb"][tables], st["stacks"][tables, sb_seat])
+        bb = np.minimum(st["bb"][tables], after_ante)
+        st["stacks"][tables, bb_seat] -= st["ante"][tables]
+        st["pot"][tables] += st["ante"][tables]
+        self.invest(tables, bb_seat, bb)
+        self.invest(tables, sb_seat, sb)
+        return status
+
+    def is_blind(self, tables, seats):
+        st = self.state
+        active = st["active_mask"][tables]
+        dealer = st["dealer"][tables]
+        sb = np.where(self.popcount[active] == 2, dealer, self.next[active, dealer])
+        bb = self.next[active, sb]
+        blind = np.where(seats == sb, st["current_bets"][tables, sb] == st["sb"][tables],
+                         (seats == bb) & (st["current_bets"][tables, bb] == st["bb"][tables]))
+        return (st["street"][tables] == PREFLOP) & blind
+
+    def may_check(self, tables=None):
+        st = self.state
+        tables = np.arange(self.tables) if tables is None else tables
+        return st["current_bets"][tables, st["acting_seat"][tables]] == st["current_bet"][tables]
+
+    def may_bet(self, tables=None):
+        st = self.state
+        tables = np.arange(self.tables) if tables is None else tables
+        seats = st["acting_seat"][tables]
+        difference = st["current_bet"][tables] - st["current_bets"][tables, seats]
+        return st["initial_bet"][tables] | (difference >= st["previous_raise"][tables]) | self.is_blind(tables, seats)
+
+    def step(self, kinds, amounts=None):
+        """_summary_
+        Take one action at every table, for its acting seat
+        Args:
+            kinds (ndarray): NONE, FOLD, CHECK, CALL or BET for each table, NONE skips the table
+            amounts (ndarray): total bet for tables betting
+
+        Returns:
+            ndarray: OK or INVALID for each table
+        """
+        st = self.state
+        kinds = np.asarray(kinds)
+        amounts = np.zeros(self.tables, dtype=np.int64) if amounts is None else np.asarray(amounts)
+        errors = np.full(self.tables, OK)
+        running = (st["street"] != END) & (st["remaining_mask"] != 0)
+        errors[(kinds != NONE) & ~running] = INVALID
+        acting = np.flatnonzero((kinds != NONE) & running)
+        kinds = kinds[acting]
+        seats = st["acting_seat"][acting].astype(np.int64)
+        may_check = self.may_check(acting)
+
+        folds = kinds == FOLD
+        tables, fold_seats = acting[folds], seats[folds]
+        st["pot"][tables] += st["current_bets"][tables, fold_seats]
+        st["current_bets"][tables, fold_seats] = 0
+        st["remaining_mask"][tables] &= ~self.bits[fold_seats]
+
+        checks = (kinds == CHECK) & may_check
+        errors[acting[(kinds == CHECK) & ~may_check]] = INVALID
+
+        calls = (kinds == CALL) & ~may_check
+        errors[acting[(kinds == CALL) & may_check]] = INVALID
+        tables, call_seats = acting[calls], seats[calls]
+        difference = st["current_bet"][tables] - st["current_bets"][tables, call_seats]
+        self.invest(tables, call_seats, np.minimum(st["stacks"][tables, call_seats], difference))
+
+        bets = kinds == BET
+        tables, bet_seats = acting[bets], seats[bets]
+        chips = amounts[tables]
+        current_bet = st["current_bet"][tables]
+        stacks = st["stacks"][tables, bet_seats]
+        additional = np.minimum(stacks, chips - st["current_bets"][tables, bet_seats])
+        legal_raise = chips >= current_bet + st["previous_raise"][tables]
+        allin = additional >= stacks
+        valid = self.may_bet(tables) & (chips > 0) & (chips > current_bet) & (legal_raise | allin)
+        errors[tables[~valid]] = INVALID
+        tables, bet_seats, chips, current_bet, additional, legal_raise = (
+            tables[valid], bet_seats[valid], chips[valid], current_bet[valid], additional[valid], legal_raise[valid])
+        st["previous_raise"][tables] = np.where(legal_raise, chips - current_bet, st["previous_raise"][tables])
+        st["initial_bet"][tables] = False
+        st["current_bet"][tables] = chips
+        self.invest(tables, bet_seats, additional)
+
+        forward = np.concatenate([acting[folds | checks | calls], tables])
+        reopen = np.concatenate([np.zeros(len(forward) - len(tables), dtype=bool), np.ones(len(tables), dtype=bool)])
+        self.action_forward(forward, reopen)
+        return errors
+
+    def players_allin(self, tables):
+        st = self.state
+        live = (st["remaining_mask"][tables, None] & self.bits) != 0
+        invested = st["chips_invested"][tables]
+        not_allin = live & (st["stacks"][tables] != 0)
+        count = not_allin.sum(axis=1)
+        # One player who is not allin must have called the largest allin bet for the hand to be allin
+        seat = not_allin.argmax(axis=1)
+        called = invested[np.arange(len(tables)), seat] >= invested.max(axis=1)
+        return (count == 0) | ((count == 1) & called)
+
+    def action_forward(self, tables, reopen):
+        st = self.state
+        if len(tables) == 0:
+            return
+        remaining = st["remaining_mask"][tables]
+        uncontested = self.popcount[remaining] == 1
+        winners = tables[uncontested]
+        winner_seats = (remaining[uncontested, None] & self.bits).argmax(axis=1)
+        st["stacks"][winners, winner_seats] += st["pot"][winners] + st["current_bets"][winners].sum(axis=1)
+        st["remaining_mask"][winners] = 0
+        st["to_act_mask"][winners] = 0
+        st["went_showdown"][winners] = False
+        st["street"][winners] = END
+        tables, reopen = tables[~uncontested], reopen[~uncontested]
+
+        previous = st["acting_seat"][tables].astype(np.int64)
+        st["to_act_mask"][tables] &= ~self.bits[previous]
+        reopened, previous_reopened = tables[reopen], previous[reopen]
+        st["to_act_mask"][reopened] = st["remaining_mask"][reopened] & ~self.bits[previous_reopened]
+        st["acting_seat"][reopened] = self.next[st["remaining_mask"][reopened], previous_reopened]
+        moving = ~reopen & (st["to_act_mask"][tables] != 0)
+        st["acting_seat"][tables[moving]] = self.next[st["to_act_mask"][tables[moving]], previous[moving]]
+        # Skip players who are already allin
+        while True:
+            skipping = tables[(st["to_act_mask"][tables] != 0) & (st["stacks"][tables, st["acting_seat"][tables]] == 0)]
+            if len(skipping) == 0:
+                break
+            st["to_act_mask"][skipping] &= ~self.bits[st["acting_seat"][skipping]]
+            left = skipping[st["to_act_mask"][skipping] != 0]
+            st["acting_seat"][left] = self.next[st["to_act_mask"][left], st["acting_seat"][left]]
+        done = (st["to_act_mask"][tables] == 0) | self.players_allin(tables)
+        self.next_street(tables[done])
+
+    def next_street(self, tables):
+        st = self.state
+        if len(tables) == 0:
+            return
+        st["current_bet"][tables] = 0
+        st["previous_raise"][tables] = st["bb"][tables]
+        st["initial_bet"][tables] = True
+        st["pot"][tables] += st["current_bets"][tables].sum(axis=1)
+        st["current_bets"][tables] = 0
+        remaining = st["remaining_mask"][tables]
+        st["acting_seat"][tables] = self.next[remaining, st["dealer"][tables]]
+        st["to_act_mask"][tables] = remaining
+
+        street = st["street"][tables]
+        river = tables[street == RIVER]
+        self.showdown(river)
+        st["street"][river] = END
+        # Each player who has gone broke during the hand will automatically sit out
+        active = st["active_mask"][river]
+        busted = self.seat_mask(st["stacks"][river] == 0) & active
+        active &= ~busted
+        st["active_mask"][river] = active
+        st["dealer"][river[(busted != 0) & (self.popcount[active] == 1)]] = -1
+
+        tables, street = tables[street != RIVER], street[street != RIVER]
+        st["board_count"][tables] += np.where(street == PREFLOP, 3, 1).astype(np.int8)
+        st["street"][tables] = street + 1
+        # If first to act is already allin, move the action forward to the next player who may act
+        stuck = (st["stacks"][tables, st["acting_seat"][tables]] == 0) | self.players_allin(tables)
+        self.action_forward(tables[stuck], np.zeros(stuck.sum(), dtype=bool))
+
+    def showdown(self, tables):
+        """_summary_
+        Pay out the main pot and side pots of tables at showdown, all in one pass over the pot levels
+        Pots are formed from chips_invested as in PokerGame.collect_pots, with consecutive pots
+        Contested by the same seats merged, the ante added to the main pot and uncalled chips returned
+        """
+        st = self.state
+        seats = self.seats
+        count = len(tables)
+        if count == 0:
+            return
+        rows = np.arange(count)
+        cards = np.concatenate([np.broadcast_to(st["board"][tables, None, :], (count, seats, 5)), st["hands"][tables]], axis=2)
+        products, suit_masks = summarize(cards.astype(np.int64))
+        remaining = st["remaining_mask"][tables]
+        live = (remaining[:, None] & self.bits) != 0
+        scores = np.where(live, score_cards(products, suit_masks), NO_SCORE)
+        invested = st["chips_invested"][tables]
+        dealer = st["dealer"][tables]
+        stacks = st["stacks"][tables]
+
+        def pay(paying, chips, eligible):
+            eligible_seats = (eligible[:, None] & self.bits) != 0
+            pot_scores = np.where(eligible_seats, scores, NO_SCORE)
+            winners = eligible_seats & (pot_scores == pot_scores.min(axis=1, keepdims=True))
+            winner_count = np.maximum(winners.sum(axis=1), 1)
+            share, remainder = np.divmod(chips, winner_count)
+            # Odd chips go to the winners closest clockwise from the dealer
+            start = self.next[self.seat_mask(winners), dealer]
+            position = (np.arange(seats) - start[:, None]) % seats
+            rank = (winners[:, None, :] & (position[:, None, :] < position[:, :, None])).sum(axis=2)
+            won = winners * share[:, None] + (winners & (rank < remainder[:, None]))
+            stacks[paying] += won[paying]
+
+        levels = np.sort(invested, axis=1)
+        previous_level = np.zeros(count, dtype=np.int64)
+        pot_chips = np.zeros(count, dtype=np.int64)
+        pot_eligible = np.full(count, -1)
+        ante = st["ante"][tables]
+        for ind in range(seats):
+            level = levels[:, ind]
+            new = level > previous_level
+            contributors = seats - ind
+            chips = (level - previous_level) * contributors
+            if contributors == 1:
+                # Chips only the deepest player put in were never called
+                deepest = invested.argmax(axis=1)
+                stacks[rows[new], deepest[new]] += chips[new]
+            else:
+                eligible = remaining & self.seat_mask(invested >= level[:, None])
+                merged = new & (pot_eligible == eligible)
+                started = new & ~merged
+                pay(started & (pot_eligible >= 0), pot_chips, pot_eligible)
+                pot_chips = np.where(started, chips + np.where(pot_eligible < 0, ante, 0), pot_chips + np.where(merged, chips, 0))
+                pot_eligible = np.where(started, eligible, pot_eligible)
+            previous_level = np.where(new, level, previous_level)
+        pay(pot_eligible >= 0, pot_chips, pot_eligible)
+        st["stacks"][tables] = stacks
+        st["went_showdown"][tables] = True
+        st["remaining_mask"][tables] = 0
+
+def random_actions(batch, rng, invalid=0.02):
+    """_summary_
+    Choose a random action for every table with a hand running, like Simulator.RandomPolicy,
+    With a few deliberately illegal ones to check that both engines reject them
+    Returns:
+        tuple(ndarray, ndarray): action kinds and amounts
+    """
+    st = batch.state
+    tables = np.arange(batch.tables)
+    running = (st["street"] != END) & (st["remaining_mask"] != 0)
+    may_check = batch.may_check()
+    may_bet = batch.may_bet()
+    roll = rng.random(batch.tables)
+    kinds = np.where(may_check, CHECK, np.where(roll < 0.35, FOLD, CALL))
+    seats = st["acting_seat"]
+    most = st["current_bets"][tables, seats] + st["stacks"][tables, seats]
+    least = np.minimum(st["current_bet"] + st["previous_raise"], most)
+    amounts = np.where(rng.random(batch.tables) < 0.05, most, least + (rng.random(batch.tables) * (most - least + 1)).astype(np.int64))
+    betting = may_bet & (roll < 0.15) & (amounts > st["current_bet"])
+    kinds = np.where(betting, BET, kinds)
+    wrong = rng.random(batch.tables) < invalid
+    kinds = np.where(wrong, rng.integers(FOLD, BET + 1, batch.tables), kinds)
+    amounts = np.where(wrong, rng.integers(0, 3 * np.maximum(most, 1)), amounts)
+    return np.where(running, kinds, NONE), amounts
+
+def scalar_state(game):
+    """_summary_
+    The fields of a PokerGame that PokerGameBatch tracks, for comparing the two
+    """
+    return {
+        "stacks": list(game.stacks), "current_bets": list(game.current_bets), "chips_invested": list(game.chips_invested),
+        "pot": game.pot, "current_bet": game.current_bet, "previous_raise": game.previous_raise, "initial_bet": game.initial_bet,
+        "street": game.street.value, "dealer": -1 if game.dealer is None else game.dealer, "remaining_mask": game.remaining_mask,
+        "to_act_mask": game.to_act_mask, "active_mask": game.active_mask, "went_showdown": game.went_showdown,
+        "acting_seat": game.acting_seat if game.hand_running() else None, "board": [INDEX_CARDS.index(card) for card in game.board]
+    }
+
+def batch_state(batch, table):
+    row = batch.state[table]
+    return {
+        "stacks": row["stacks"].tolist(), "current_bets": row["current_bets"].tolist(), "chips_invested": row["chips_invested"].tolist(),
+        "pot": int(row["pot"]), "current_bet": int(row["current_bet"]), "previous_raise": int(row["previous_raise"]),
+        "initial_bet": bool(row["initial_bet"]), "street": int(row["street"]), "dealer": int(row["dealer"]),
+        "remaining_mask": int(row["remaining_mask"]), "to_act_mask": int(row["to_act_mask"]), "active_mask": int(row["active_mask"]),
+        "went_showdown": bool(row["went_showdown"]), "acting_seat": int(row["acting_seat"]) if row["street"] != END else None,
+        "board": row["board"][:row["board_count"]].tolist()
+    }
+
+def differential_test(tables=200, hands=50, seats=6, stack=200, ante=0, seed=0):
+    """_summary_
+    Play random hands on a PokerGameBatch and on one PokerGame per table, dealing both the same
+    Cards and taking the same actions, and compare every table after every step
+    Returns:
+        tuple(int, int): hands and actions compared
+    """
+    rng = np.random.default_rng(seed)
+    batch = PokerGameBatch(tables, seats, ante=ante, seed=seed)
+    games = [PokerGame(seats) for table in range(tables)]
+    for game in games:
+        game.ante = ante
+    actions = 0
+    for hand in range(hands):
+        # Refill every table where a player has busted, giving both engines the same button
+        refill = [table for table in range(tables) if batch.state["active_mask"][table] != (1 << seats) - 1]
+        if refill:
+            batch.sit(np.full((len(refill), seats), stack), refill)
+            for table in refill:
+                dealer = int(rng.integers(seats))
+                batch.state["dealer"][table] = dealer
+                game = games[table]
+                game.dealer = dealer
+                for seat in range(seats):
+                    if not game.occupied_mask & (1 << seat):
+                        game.buyin(seat, stack)
+                    game.stacks[seat] = stack
+                    if not game.active_mask & (1 << seat):
+                        game.sitin(seat)
+        cards = np.argpartition(rng.random((tables, 52)), 2 * seats + 4, axis=1)[:, :2 * seats + 5]
+        status = batch.deal(np.arange(tables), cards)
+        for table, game in enumerate(games):
+            dealt = [int(card) for seat in range(seats) if game.active_mask & (1 << seat) for card in cards[table, 2 * seat:2 * seat + 2]]
+            game.deck = RecordedDeck([INDEX_CARDS[card] for card in dealt + cards[table, 2 * seats:].tolist()])
+            try:
+                game.deal()
+                scalar_status = OK
+            except NoPlayersException:
+                scalar_status = NO_PLAYERS
+            except ShortStackException:
+                scalar_status = SHORT_STACK
+            if scalar_status != status[table]:
+                raise AssertionError(f"Table {table} hand {hand}: deal status {status[table]}, PokerGame {scalar_status}")
+        while True:
+            kinds, amounts = random_actions(batch, rng)
+            if not (kinds != NONE).any():
+                break
+            errors = batch.step(kinds, amounts)
+            for table in np.flatnonzero(kinds != NONE):
+                game = games[table]
+                try:
+                    match kinds[table]:
+                        case 1:
+                            game.fold()
+                        case 2:
+                            game.check()
+                        case 3:
+                            game.call()
+                        case 4:
+                            game.bet(int(amounts[table]))
+                    scalar_error = OK
+                except Exception:
+                    scalar_error = INVALID
+                actions += 1
+                expected = scalar_state(game)
+                got = batch_state(batch, table)
+                if scalar_error != errors[table] or expected != got:
+                    differences = {key: (expected[key], got[key]) for key in expected if expected[key] != got[key]}
+                    raise AssertionError(f"Table {table} hand {hand} action {kinds[table]} {amounts[table]}: "
+                                         f"error {errors[table]}, PokerGame {scalar_error}, differences {differences}")
+    return tables * hands, actions
+
+def bench_batch(tables=4096, hands=20, seats=6, stack=200, seed=0):
+    """_summary_
+    Time random hands stepped in lockstep
+    Returns:
+        dict: hands/sec and actions/sec
+    """
+    rng = np.random.default_rng(seed)
+    batch = PokerGameBatch(tables, seats, seed=seed)
+    batch.sit(np.full((tables, seats), stack))
+    played = 0
+    actions = 0
+    start = time.perf_counter()
+    for hand in range(hands):
+        refill = np.flatnonzero(batch.popcount[batch.state["active_mask"]] < seats)
+        batch.sit(np.full((len(refill), seats), stack), refill)
+        played += (batch.deal() == OK).sum()
+        while True:
+            kinds, amounts = random_actions(batch, rng, invalid=0)
+            if not (kinds != NONE).any():
+                break
+            batch.step(kinds, amounts)
+            actions += (kinds != NONE).sum()
+    elapsed = time.perf_counter() - start
+    return {"hands/sec": played / elapsed, "actions/sec": actions / elapsed}
+
+if __name__ == '__main__':
+    tables = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    hands = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    seats = int(sys.argv[3]) if len(sys.argv) > 3 else 6
+    for ante in (0, 1):
+        compared_hands, compared_actions = differential_test(tables, hands, seats, ante=ante)
+        print(f"Ante {ante}: {compared_hands:,} hands and {compared_actions:,} actions matched PokerGame")
+    for name, value in bench_batch(seats=seats).items():
+        print(f"    {name}: {value:,.0f}")
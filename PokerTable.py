@@ -1,24 +1,30 @@
 from PokerGame import *
 from DataManager import *
+from Equity import exact_tally, combine_tallies, monte_carlo_equity
+from HandHistory import HandLog, Recorders
+from PlayerStats import PlayerStats, StatsRecorder
+from Events import HandStarted, ActionTaken, StreetDealt, PotAwarded, PlayerBusted
+import asyncio
 from dotenv import load_dotenv, find_dotenv
 import os
+import time
 
-def close(channelID):
+# Every table records its hands in binary history files here, see HandHistory
+HISTORY_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hand_history")
+
+async def close(channelID):
     if channelID in PokerTable.running:
         table = PokerTable.running[channelID]
         if table.game.hand_running():
             return False
-        table.close()
+        await table.close()
         del PokerTable.running[channelID]
         return table
     return False
 
 def hand_to_string(hand):
-    left = hand[0]
-    right = hand[1]
-    if card_rank(right) > card_rank(left):
-        left, right = right, left
-    return f"{card_to_string(left)} {card_to_string(right)}"
+    # Highest rank first, for the two holecards of Hold'em or the four of Omaha
+    return " ".join(card_to_string(card) for card in sorted(hand, key=card_rank, reverse=True))
 
 def card_to_string(card):
     card = Card.int_to_str(card)
@@ -37,66 +43,143 @@ def card_to_string(card):
 
 class PokerTable:
     running = {}
+    # Stats of every player, counted over the hands of all tables
+    stats = PlayerStats()
     def __init__(self, name, channelID, runnerID, options, data_manager):
-        game = PokerGame()
+        game = PokerGame(options["seats"], variant=options.get("game", HOLDEM))
         game.sb = options["sb"]
         game.bb = options["bb"]
         game.ante = options["ante"]
-        game.seats = options["seats"]
         self.current_action_id = 0
+        # Monotonic time of the last command at this table, tables idle long enough are hibernated
+        self.last_active = time.monotonic()
         self.name = name
+        self.channelID = channelID
         self.game = game
         self.time_bank = options["time_bank"]
         self.min_buy = options["min_buy"]
         self.max_buy = options["max_buy"]
         self.match_stack = options["match_stack"]
         self.players = [None for seat in range(game.seats)]
+        game.history = Recorders(HandLog(HISTORY_DIRECTORY, channelID, game.seats, list(VARIANTS).index(options.get("game", HOLDEM))), StatsRecorder(self.players, PokerTable.stats))
+        # Events of the game since the last update was sent, each with the players of its hand by seat, see changes
+        self.events = []
+        # Players by seat when the current hand was dealt, the live list until then
+        self.hand_players = self.players
+        game.subscribe(self.receive)
         self.data_manager = data_manager
+        # Held by buyins, addons and cashouts across their database call, so none of them sees another half done
+        self.chips_lock = asyncio.Lock()
         self.runnerID = runnerID
         self.options = options
+        # List of tuples (board, dict of seat -> (win, tie, equity)) for each street of an allin runout
+        self.runout_equity = []
         PokerTable.running[channelID] = self
 
-    def buyin(self, userID, seat, stack):
-        if userID in self.players:
-            return False
-        max_chips = self.max_buy * self.game.bb
-        min_chips = self.min_buy * self.game.bb
-        if self.match_stack:
-            max_chips = max(max_chips, max(self.game.stacks))
-        if stack < min_chips or stack > max_chips:
-            return False
-        player_chips = self.data_manager.get_chips(userID)
-        if stack > player_chips:
-            return False
-        try: 
-            self.game.buyin(seat, stack)
-            self.data_manager.remove_chips(userID, stack)
-        except (SeatOccupiedException, InvalidSeatException):
-            return False
-        self.players[seat] = userID
-        return True
+    def snapshot(self):
+        """_summary_
+        Capture the table and its game for a restart, see PokerGame.snapshot
+        Returns:
+            tuple: builtin types only
+        """
+        return (self.name, self.channelID, self.runnerID, self.options, self.players, self.current_action_id, self.game.snapshot())
+
+    @classmethod
+    def restore(cls, state, data_manager):
+        """_summary_
+        Reopen a table from snapshot, with every player seated as they were and any hand in progress resumed
+        Returns:
+            PokerTable: the running table
+        """
+        name, channelID, runnerID, options, players, current_action_id, game_state = state
+        table = cls(name, channelID, runnerID, options, data_manager)
+        # Only the recorders move to the restored game, it gets its own subscription below
+        table.game.unsubscribe(table.receive)
+        history = table.game.history
+        table.game = PokerGame.restore(game_state)
+        table.game.history = history
+        table.game.subscribe(table.receive)
+        table.players[:] = players
+        table.current_action_id = current_action_id
+        return table
+
+    async def buyin(self, userID, seat, stack):
+        async with self.chips_lock:
+            if userID in self.players:
+                return False
+            max_chips = self.max_buy * self.game.bb
+            min_chips = self.min_buy * self.game.bb
+            if self.match_stack:
+                max_chips = max(max_chips, max(self.game.stacks))
+            if stack < min_chips or stack > max_chips:
+                return False
+            # Removed only if the balance covers the whole stack, in the same round trip as the check
+            if await self.data_manager.remove_chips(userID, stack) is None:
+                return False
+            try: 
+                self.game.buyin(seat, stack)
+            except (SeatOccupiedException, InvalidSeatException):
+                await self.data_manager.add_chips(userID, stack)
+                return False
+            self.players[seat] = userID
+            return True
     
-    def addon(self, userID, chips):
-        if userID not in self.players:
-            return False
-        seat = self.players.index(userID)
-        max_total = self.max_buy * self.game.bb
-        min_total = self.min_buy * self.game.bb
-        if self.match_stack:
-            max_chips = max(max_chips, max(self.game.stacks))
-        total = chips + self.game.stacks[seat]
-        if total < min_total or total > max_total:
-            return False
-        player_chips = self.data_manager.get_chips(userID)
-        if chips > player_chips:
-            return False
-        self.game.addon(seat, chips)
-        self.data_manager.remove_chips(userID, chips)
-        return True
+    async def addon(self, userID, chips):
+        async with self.chips_lock:
+            if userID not in self.players:
+                return False
+            seat = self.players.index(userID)
+            max_total = self.max_buy * self.game.bb
+            min_total = self.min_buy * self.game.bb
+            if self.match_stack:
+                max_chips = max(max_chips, max(self.game.stacks))
+            total = chips + self.game.stacks[seat]
+            if total < min_total or total > max_total:
+                return False
+            if await self.data_manager.remove_chips(userID, chips) is None:
+                return False
+            self.game.addon(seat, chips)
+            return True
     
     def acting_player(self):
-        return self.players[self.game.action_permissions[0]]
+        return self.players[self.game.acting_seat]
     
+    async def calculate_runout_equity(self, executor, partitions=4):
+        """_summary_
+        Calculate exact equities at each street of the current Hold'em or Omaha hand's allin runout, if it had one
+        Enumeration runs in executor, split into partitions, so the event loop is never blocked
+        Args:
+            executor (concurrent.futures.Executor): process pool to run enumeration in
+            partitions (int): number of tasks each street's enumeration is split into
+        """
+        game = self.game
+        # Enumeration deals from the full deck, so short deck hands show no runout equity
+        if len(game.runout_boards) == 0 or game.rules is VARIANTS[SHORT_DECK]:
+            self.runout_equity = []
+            return
+        seats = mask_seats(game.runout_mask)
+        hands = [game.hands[seat] for seat in seats]
+        loop = asyncio.get_running_loop()
+
+        async def enumerated(tasks):
+            return combine_tallies(await asyncio.gather(*tasks))
+
+        async def sampled(task):
+            return (await task)[0]
+
+        stages = []
+        for board in game.runout_boards:
+            if game.rules is VARIANTS[OMAHA] and len(board) == 0:
+                # Every preflop runout of Omaha hands takes seconds to enumerate even split up, so that street is sampled
+                stages.append((board, sampled(loop.run_in_executor(executor, monte_carlo_equity, hands, []))))
+            else:
+                tasks = [loop.run_in_executor(executor, exact_tally, hands, list(board), partition, partitions) for partition in range(partitions)]
+                stages.append((board, enumerated(tasks)))
+        runout_equity = []
+        for board, equities in stages:
+            runout_equity.append((board, dict(zip(seats, await equities))))
+        self.runout_equity = runout_equity
+
     def state(self):
         """_summary_
 
@@ -112,13 +195,26 @@ class PokerTable:
                 text += f"{card_to_string(card)} "
             text += '\n'
         text += f"Pot: {pot}\n"
+        pots = game.pot_structure()
+        if game.street != Streets.End and len(pots) > 1:
+            for ind, (chips, seats) in enumerate(pots):
+                pot_name = "Main Pot" if ind == 0 else f"Side Pot {ind}"
+                eligible = " ".join(f"<@{self.players[seat]}>" for seat in seats)
+                text += f"{pot_name}: {chips} ({eligible})\n"
         if game.street != Streets.End:
             text += "Current Bets:\n"
             for seat in game.active_seats:
                 text += f"<@{self.players[seat]}> ({game.stacks[seat]}): {game.current_bets[seat]}\n"
-            text += f"Action on: <@{self.acting_player()}>"
+            text += self.action_prompt()
         else:
             winners = game.recent_winners
+            if len(self.runout_equity) != 0:
+                text += "Allin Equity:\n"
+                for board, equities in self.runout_equity:
+                    street_name = "Preflop" if len(board) == 0 else " ".join(card_to_string(card) for card in board)
+                    text += f"{street_name}: "
+                    text += ", ".join(f"<@{self.players[seat]}> {equity:.1%}" for seat, (win, tie, equity) in equities.items())
+                    text += '\n'
             if game.went_showdown:
                 text += f"Winning {'Hands' if len(winners) > 1 else 'Hand'}:\n"
                 for seat in winners:
@@ -131,6 +227,66 @@ class PokerTable:
 
         return text
 
+    def action_prompt(self):
+        """_summary_
+        Returns:
+            string: who is to act and the actions open to them
+        """
+        text = f"Action on: <@{self.acting_player()}>"
+        legal_actions = self.game.legal_actions()
+        if legal_actions is not None:
+            options = "Fold, " + ("Check" if legal_actions.check else f"Call {legal_actions.call_amount}")
+            if legal_actions.bet and legal_actions.min_bet <= legal_actions.max_bet:
+                if legal_actions.min_bet < legal_actions.max_bet:
+                    options += f", Bet {legal_actions.min_bet}-{legal_actions.max_bet}"
+                else:
+                    options += f", Allin {legal_actions.max_bet}"
+            text += f"\nOptions: {options}"
+        return text
+
+    def receive(self, event):
+        if isinstance(event, HandStarted):
+            # A player who folds may cash out and someone else sit down before the hand ends
+            self.hand_players = list(self.players)
+        self.events.append((event, self.hand_players))
+
+    def changes(self):
+        """_summary_
+        Describe what has happened since the last update, from the game's events rather than the whole table,
+        Followed by the pot and the next action while the hand is running
+
+        Returns:
+            string: one line per action, street, pot won and player busted
+        """
+        game = self.game
+        lines = []
+        for event, players in self.events:
+            if isinstance(event, ActionTaken):
+                player = f"<@{players[event.seat]}>"
+                match event.action:
+                    case "bet":
+                        lines.append(f"{player} bets {event.chips}")
+                    case "call":
+                        lines.append(f"{player} calls {event.chips}")
+                    case "check":
+                        lines.append(f"{player} checks")
+                    case "fold":
+                        lines.append(f"{player} folds")
+            elif isinstance(event, StreetDealt):
+                # The flop, turn and river complete the board to 3, 4 and 5 cards
+                board = game.board[:event.street + 2]
+                lines.append(f"{Streets(event.street).name}: " + " ".join(card_to_string(card) for card in board))
+            elif isinstance(event, PotAwarded):
+                player = f"<@{players[event.seat]}>"
+                lines.append(f"{player} {'gets back' if event.uncalled else 'wins'} {event.chips}")
+            elif isinstance(event, PlayerBusted):
+                lines.append(f"<@{players[event.seat]}> is out of chips and sat out")
+        self.events.clear()
+        if game.hand_running():
+            lines.append(f"Pot: {game.pot + sum(game.current_bets)}")
+            lines.append(self.action_prompt())
+        return "\n".join(lines)
+
     def sitin(self, userID):
         if not (userID in self.players):
             return False
@@ -151,23 +307,25 @@ class PokerTable:
             return False
         return True
     
-    def cashout(self, userID):
-        if not (userID in self.players):
-            return False
-        seat = self.players.index(userID)
-        try:
-            chips = self.game.cashout(seat)
-            self.data_manager.add_chips(userID, chips)
-            self.players[seat] = None
-        except (SeatNotOccupiedException, InvalidSitOutException):
-            return False
-        return -1 if chips == 0 else chips
+    async def cashout(self, userID):
+        async with self.chips_lock:
+            if not (userID in self.players):
+                return False
+            seat = self.players.index(userID)
+            try:
+                chips = self.game.cashout(seat)
+                await self.data_manager.add_chips(userID, chips)
+                self.players[seat] = None
+            except (SeatNotOccupiedException, InvalidSitOutException):
+                return False
+            return -1 if chips == 0 else chips
     
-    def close(self):
+    async def close(self):
         for playerID in self.players:
             if playerID == None:
                 continue
-            self.cashout(playerID)
+            await self.cashout(playerID)
+        self.game.history.close()
 
 
 if __name__ == '__main__':
@@ -180,4 +338,5 @@ if __name__ == '__main__':
     a = cards("Ah5d")
     b = cards("4sKc")
     c = cards("Qs2s")
-    print(hand_to_string(a), hand_to_string(b), hand_to_string(c))
\ No newline at end of file
+    d = cards("5h8cAsTd")
+    print(hand_to_string(a), hand_to_string(b), hand_to_string(c), hand_to_string(d))
\ No newline at end of file
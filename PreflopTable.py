@@ -0,0 +1,202 @@
+import mmap
+import os
+import struct
+import sys
+import time
+from bisect import bisect_left
+from itertools import combinations, permutations
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from Equity import card_index, summarize, score_cards
+
+"""
+Precomputed heads-up preflop equities, stored in a binary file which is memory mapped on load
+
+Build the file with:
+    python PreflopTable.py [boards] [path]
+
+File layout, little endian:
+    header: magic b"PFEQ", version (u16), boards sampled (u32), number of matchups (u32)
+    matchup keys: sorted u32 key of each suit-distinct matchup
+    matchup results: u16 win, u16 tie of the first hand for each matchup key
+    Version 1 files also hold a 169 x 169 u16 table of hand class equities after the header, which is skipped
+
+Suits matter for exact matchups (AsKs vs QsJs has less equity than AsKs vs QhJh), so every
+Matchup is stored individually, keyed by its form with suits relabeled to the smallest key.
+Fractions are stored as multiples of 1/65535.
+"""
+
+MAGIC = b"PFEQ"
+VERSION = 2
+HEADER = struct.Struct("<4sHII")
+# Bytes between the header and the matchup keys for each version that can be read
+CLASS_TABLE_BYTES = {1: 169 * 169 * 2, 2: 0}
+SCALE = 65535
+SUIT_PERMUTATIONS = list(permutations(range(4)))
+# Card index after relabeling suits, for each suit permutation
+PERMUTED_CARDS = [[(card & ~3) | perm[card & 3] for card in range(52)] for perm in SUIT_PERMUTATIONS]
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "preflop_equity.bin")
+
+def matchup_key(hand1, hand2):
+    """_summary_
+    Key identifying a matchup of 2 card index hands, the same for every relabeling of suits
+    Returns:
+        int: smallest encoding of the matchup over all suit permutations
+    """
+    best = None
+    for permuted in PERMUTED_CARDS:
+        a = permuted[hand1[0]]
+        b = permuted[hand1[1]]
+        c = permuted[hand2[0]]
+        d = permuted[hand2[1]]
+        if a < b:
+            a, b = b, a
+        if c < d:
+            c, d = d, c
+        key = ((a * 52 + b) * 52 + c) * 52 + d
+        if best is None or key < best:
+            best = key
+    return best
+
+def matchup_keys(highs1, lows1, highs2, lows2):
+    """_summary_
+    Vectorized matchup_key over arrays of card indices
+    """
+    best = None
+    for perm in SUIT_PERMUTATIONS:
+        perm = np.array(perm)
+        a, b, c, d = [(cards & ~3) | perm[cards & 3] for cards in (highs1, lows1, highs2, lows2)]
+        key = ((np.maximum(a, b) * 52 + np.minimum(a, b)) * 52 + np.maximum(c, d)) * 52 + np.minimum(c, d)
+        best = key if best is None else np.minimum(best, key)
+    return best
+
+def sample_matchups(hands1, hands2, boards, seed, chunk_size=100):
+    """_summary_
+    Count wins and ties of hands1 against hands2 over randomly sampled boards
+    Boards which share a card with either hand are skipped for that matchup
+    Args:
+        hands1 (ndarray): shape (matchups, 2) card indices
+        hands2 (ndarray): shape (matchups, 2) card indices
+        boards (int): number of boards to sample
+        seed (int): seed for the random generator
+
+    Returns:
+        tuple(ndarray, ndarray, ndarray): wins, ties, and valid boards for each matchup
+    """
+    rng = np.random.default_rng(seed)
+    combos = np.array(list(combinations(range(52), 2)))
+    combo_masks = (np.int64(1) << combos[:, 0]) | (np.int64(1) << combos[:, 1])
+    combo_products, combo_suits = summarize(combos)
+    # Position of each matchup's hands among the 1326 combos
+    combo_ids = {tuple(combo): ind for ind, combo in enumerate(combos.tolist())}
+    ids1 = np.array([combo_ids[tuple(sorted(hand))] for hand in hands1.tolist()])
+    ids2 = np.array([combo_ids[tuple(sorted(hand))] for hand in hands2.tolist()])
+    invalid = np.iinfo(np.int32).max
+
+    wins = np.zeros(len(ids1), dtype=np.int64)
+    ties = np.zeros(len(ids1), dtype=np.int64)
+    valid_boards = np.zeros(len(ids1), dtype=np.int64)
+    for start in range(0, boards, chunk_size):
+        size = min(chunk_size, boards - start)
+        drawn = np.argpartition(rng.random((size, 52)), 4, axis=1)[:, :5]
+        board_masks = np.bitwise_or.reduce(np.int64(1) << drawn, axis=1)
+        board_products, board_suits = summarize(drawn)
+        # Every combo not sharing a card with the board is scored once per board, then matchups only compare scores
+        board_ids, ids = np.nonzero((board_masks[:, None] & combo_masks[None, :]) == 0)
+        scores = np.full((size, len(combos)), invalid, dtype=np.int32)
+        scores[board_ids, ids] = score_cards(board_products[board_ids] * combo_products[ids],
+                                             board_suits[:, board_ids] + combo_suits[:, ids])
+        scores1 = scores[:, ids1]
+        scores2 = scores[:, ids2]
+        valid = (scores1 != invalid) & (scores2 != invalid)
+        wins += ((scores1 < scores2) & valid).sum(axis=0)
+        ties += ((scores1 == scores2) & valid).sum(axis=0)
+        valid_boards += valid.sum(axis=0)
+    return wins, ties, valid_boards
+
+def build_table(path=DEFAULT_PATH, boards=200000, processes=None):
+    """_summary_
+    Estimate every heads-up preflop matchup and write the table file
+    Args:
+        path (string): file to write
+        boards (int): number of random boards every matchup is played over
+        processes (int): number of worker processes, defaults to the number of cores
+    """
+    combos = np.array(list(combinations(range(52), 2)))
+    first, second = np.meshgrid(np.arange(len(combos)), np.arange(len(combos)), indexing="ij")
+    first, second = first.ravel(), second.ravel()
+    lows1, highs1 = combos[first, 0], combos[first, 1]
+    lows2, highs2 = combos[second, 0], combos[second, 1]
+    disjoint = (lows1 != lows2) & (lows1 != highs2) & (highs1 != lows2) & (highs1 != highs2)
+    first, second = first[disjoint], second[disjoint]
+    keys = matchup_keys(highs1[disjoint], lows1[disjoint], highs2[disjoint], lows2[disjoint])
+    unique_keys, representatives = np.unique(keys, return_index=True)
+    hands1 = combos[first[representatives]]
+    hands2 = combos[second[representatives]]
+
+    # Boards are split across processes, each sampling with its own seed
+    processes = processes or os.cpu_count()
+    shares = [boards // processes + (1 if ind < boards % processes else 0) for ind in range(processes)]
+    with ProcessPoolExecutor(processes) as executor:
+        results = list(executor.map(sample_matchups, [hands1] * processes, [hands2] * processes, shares, range(processes)))
+    wins = sum(result[0] for result in results)
+    ties = sum(result[1] for result in results)
+    valid_boards = sum(result[2] for result in results)
+    win_fractions = wins / valid_boards
+    tie_fractions = ties / valid_boards
+
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, boards, len(unique_keys)))
+        file.write(unique_keys.astype("<u4").tobytes())
+        results = np.stack([np.round(win_fractions * SCALE), np.round(tie_fractions * SCALE)], axis=1)
+        file.write(results.astype("<u2").tobytes())
+
+class PreflopTable:
+    def __init__(self, path=DEFAULT_PATH):
+        """_summary_
+        Memory map a table file written by build_table
+        Nothing is read until a lookup touches it, so loading costs neither time nor memory
+        """
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.boards, self.matchups = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version not in CLASS_TABLE_BYTES:
+            raise ValueError(f"{path} is not a preflop table")
+        view = memoryview(self.map)
+        keys_start = HEADER.size + CLASS_TABLE_BYTES[version]
+        results_start = keys_start + self.matchups * 4
+        self.keys = view[keys_start:results_start].cast("I")
+        self.results = view[results_start:results_start + self.matchups * 4].cast("H")
+
+    def matchup(self, hand1, hand2):
+        """_summary_
+        Look up a heads-up preflop matchup
+        Args:
+            hand1 (tuple): 2 treys card ints
+            hand2 (tuple): 2 treys card ints
+
+        Returns:
+            tuple(float, float, float): win, tie and equity of hand1
+        """
+        key = matchup_key([card_index(card) for card in hand1], [card_index(card) for card in hand2])
+        ind = bisect_left(self.keys, key)
+        win = self.results[ind * 2] / SCALE
+        tie = self.results[ind * 2 + 1] / SCALE
+        return win, tie, win + tie / 2
+
+def load_preflop_table(path=DEFAULT_PATH):
+    """_summary_
+    Load the preflop table if it has been built
+    Returns:
+        PreflopTable: the table, or None if the file does not exist
+    """
+    if not os.path.exists(path):
+        return None
+    return PreflopTable(path)
+
+if __name__ == '__main__':
+    boards = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_PATH
+    start = time.perf_counter()
+    build_table(path, boards)
+    print(f"Wrote {path} in {time.perf_counter() - start:.0f} seconds")
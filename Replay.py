@@ -0,0 +1,143 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from Benchmark import acting_seat, load_engine, make_game
+from HandHistory import HandHistoryReader, decode_hand, read_header
+
+"""
+Rebuild recorded hands by driving a fresh PokerGame through the same deal and actions,
+And check that every player finishes the hand with the stack that was logged
+
+Usage:
+    python Replay.py <history directory> <table id> [path/to/PokerGame.py] [processes]
+
+Passing another engine replays the history on it, so payouts of an engine upgrade
+Can be diffed against every hand played on the current one.
+"""
+
+ENGINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "PokerGame.py")
+ACTION_EVENTS = {"bet", "call", "check", "fold"}
+
+class ReplayMismatchException(Exception):
+    pass
+
+class RecordedDeck:
+    """
+    Deck which deals a fixed sequence of cards, in place of a shuffled Deck
+    """
+    __slots__ = ("cards", "position")
+    def __init__(self, cards):
+        self.cards = cards
+        self.position = 0
+
+    def shuffle(self):
+        self.position = 0
+
+    def pop(self):
+        card = self.cards[self.position]
+        self.position += 1
+        return card
+
+def replay_hand(hand, seats, engine, variant=0):
+    """_summary_
+    Replay one hand decoded by decode_hand
+    The recorded cards stand in for the shuffle: holecards are dealt seat by seat, then the board,
+    So the hand is rebuilt exactly whether it was dealt from a seeded or a secure shuffle
+    Args:
+        hand (dict): decoded hand
+        seats (int): seats at the table
+        engine (module): module containing PokerGame
+        variant (int): index of the table's game in the engine's VARIANTS, from the file header
+
+    Returns:
+        dict: seat -> stack after the replayed hand
+    """
+    # Engines older than variants only play Hold'em
+    game = make_game(engine, seats, variant=list(engine.VARIANTS)[variant] if variant else None)
+    game.sb = hand["sb"]
+    game.bb = hand["bb"]
+    game.ante = hand["ante"]
+    for seat, stack in hand["stacks"].items():
+        game.buyin(seat, stack)
+        game.sitin(seat)
+    # deal() moves the button to the next active seat, which is the recorded dealer
+    game.dealer = (hand["dealer"] - 1) % seats
+    recorded = RecordedDeck([card for seat in sorted(hand["hands"]) for card in hand["hands"][seat]] + hand["board"])
+    if hasattr(engine, "Deck"):
+        game.deck = recorded
+    else:
+        # Engines older than the Deck class build a freshly shuffled deck in deal()
+        engine.deck = lambda: recorded
+    game.deal()
+    for ind, (kind, seat, value) in enumerate(hand["events"]):
+        if kind not in ACTION_EVENTS:
+            continue
+        if not game.hand_running() or acting_seat(game) != seat:
+            raise ReplayMismatchException(f"Event {ind}: {kind} by seat {seat}, but action is on seat {acting_seat(game)}")
+        match kind:
+            case "bet":
+                game.bet(value)
+            case "call":
+                chips = min(game.stacks[seat], game.current_bet - game.current_bets[seat])
+                if chips != value:
+                    raise ReplayMismatchException(f"Event {ind}: seat {seat} called {chips}, recorded {value}")
+                game.call()
+            case "check":
+                game.check()
+            case "fold":
+                game.fold()
+    if game.hand_running():
+        raise ReplayMismatchException("Hand still running after the last recorded action")
+    return {seat: game.stacks[seat] for seat in hand["final"]}
+
+def replay_file(path, engine_path=ENGINE_PATH):
+    """_summary_
+    Replay every hand in a history file
+    Returns:
+        tuple(int, list): hands replayed, and (path, hand number, message) for every hand which did not match
+    """
+    engine = load_engine(engine_path)
+    seats, table_id, variant = read_header(path)
+    reader = HandHistoryReader(os.path.dirname(path), table_id)
+    mismatches = []
+    hands = 0
+    for hands, records in enumerate(reader.file_hands(path), 1):
+        hand = decode_hand(records)
+        try:
+            final = replay_hand(hand, seats, engine, variant)
+        except Exception as exception:
+            # An engine under test may reject a recorded action with any of its exceptions
+            mismatches.append((path, hands - 1, f"{type(exception).__name__}: {exception}"))
+            continue
+        if final != hand["final"]:
+            mismatches.append((path, hands - 1, f"Final stacks {final}, recorded {hand['final']}"))
+    return hands, mismatches
+
+def replay_session(directory, table_id, engine_path=ENGINE_PATH, processes=1):
+    """_summary_
+    Replay every recorded hand of a table, with files split across processes
+    Returns:
+        tuple(int, list): hands replayed and mismatches, see replay_file
+    """
+    paths = HandHistoryReader(directory, table_id).paths
+    if processes == 1:
+        results = [replay_file(path, engine_path) for path in paths]
+    else:
+        with ProcessPoolExecutor(processes) as executor:
+            results = list(executor.map(replay_file, paths, [engine_path] * len(paths)))
+    hands = sum(result[0] for result in results)
+    mismatches = [mismatch for result in results for mismatch in result[1]]
+    return hands, mismatches
+
+if __name__ == '__main__':
+    directory = sys.argv[1]
+    table_id = int(sys.argv[2])
+    engine_path = sys.argv[3] if len(sys.argv) > 3 else ENGINE_PATH
+    processes = int(sys.argv[4]) if len(sys.argv) > 4 else os.cpu_count()
+    start = time.perf_counter()
+    hands, mismatches = replay_session(directory, table_id, engine_path, processes)
+    elapsed = time.perf_counter() - start
+    for path, hand, message in mismatches:
+        print(f"{os.path.basename(path)} hand {hand}: {message}")
+    print(f"Replayed {hands:,} hands in {elapsed:.2f} seconds, {len(mismatches)} mismatched")
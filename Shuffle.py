@@ -0,0 +1,58 @@
+import os
+import random
+import secrets
+
+"""
+Sources of random indices for shuffling the deck
+
+Cards are dealt with an EntropyPool, which reads os.urandom in large batches so that secure
+Shuffling costs a syscall per few thousand cards rather than per card. A SeededSource gives the
+Same interface from a seeded generator, so tests and replays can reproduce every deal.
+"""
+
+class EntropyPool:
+    __slots__ = ("size", "buffer", "position")
+    def __init__(self, size=4096):
+        """_summary_
+        Args:
+            size (int): bytes read from os.urandom at a time
+        """
+        self.size = size
+        self.refill()
+
+    def refill(self):
+        self.buffer = os.urandom(self.size)
+        self.position = 0
+
+    def randbelow(self, n):
+        """_summary_
+        Return a uniformly random int in [0, n), from one byte of the pool when n <= 256
+        Bytes at or above the largest multiple of n are rejected, so no index is more likely than another
+        """
+        if n > 256:
+            return secrets.randbelow(n)
+        limit = 256 - 256 % n
+        while True:
+            if self.position >= self.size:
+                self.refill()
+            byte = self.buffer[self.position]
+            self.position += 1
+            if byte < limit:
+                return byte % n
+
+class SeededSource:
+    __slots__ = ("rng",)
+    def __init__(self, seed=None):
+        """_summary_
+        Deterministic random indices for tests and replays. Not secure, never deal real games with it
+        """
+        self.rng = random.Random(seed)
+
+    def randbelow(self, n):
+        return self.rng.randrange(n)
+
+# Shared by every game in the process
+secure_source = EntropyPool()
+# A forked child must not deal from a copy of its parent's buffered bytes
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=secure_source.refill)
@@ -0,0 +1,229 @@
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from Benchmark import acting_seat, load_engine, new_game, reset_stacks
+
+"""
+Headless hand simulator, playing many tables at once through the public PokerGame methods
+With a pluggable action policy, to size hardware and catch engine regressions before deploying
+
+Usage:
+    python Simulator.py [tables] [hands per table] [processes] [path/to/PokerGame.py]
+
+Every hand is checked for chip conservation: the chips on a table may only change when
+The simulator itself refills a busted player's stack.
+"""
+
+ENGINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "PokerGame.py")
+# Methods whose time is measured when timing is enabled. Times are inclusive,
+# So bet, call, check and fold also count the street changes and showdowns they trigger
+TIMED_METHODS = ["deal", "bet", "call", "check", "fold", "next_street", "showdown", "collect_pots"]
+ACTIONS = ["deal", "bet", "call", "check", "fold"]
+
+class ChipConservationException(Exception):
+    pass
+
+class ScriptExhaustedException(Exception):
+    pass
+
+class RandomPolicy:
+    def __init__(self, seed=None, fold=0.2, bet=0.15, allin=0.05):
+        """_summary_
+        Take a random legal action, betting a random amount between the minimum raise and allin
+        Args:
+            seed (int): seed for the policy's random generator
+            fold (float): chance of folding when facing a bet
+            bet (float): chance of betting or raising when allowed
+            allin (float): chance that a bet is allin
+        """
+        self.rng = random.Random(seed)
+        self.fold = fold
+        self.bet = bet
+        self.allin = allin
+
+    def act(self, game):
+        roll = self.rng.random()
+        if roll < self.bet and game.may_bet():
+            if hasattr(game, "legal_actions"):
+                legal_actions = game.legal_actions()
+                most = legal_actions.max_bet
+                least = min(legal_actions.min_bet, most)
+            else:
+                # Engines from before legal actions were cached have no pot limit games
+                seat = acting_seat(game)
+                most = game.current_bets[seat] + game.stacks[seat]
+                least = min(game.current_bet + game.previous_raise, most)
+            if least <= game.current_bet or self.rng.random() < self.allin:
+                chips = most
+            else:
+                chips = self.rng.randint(least, most)
+            if chips > game.current_bet:
+                game.bet(chips)
+                return "bet"
+        if game.may_check():
+            game.check()
+            return "check"
+        if roll < self.bet + self.fold:
+            game.fold()
+            return "fold"
+        game.call()
+        return "call"
+
+class ScriptedPolicy:
+    def __init__(self, script, repeat=True):
+        """_summary_
+        Take actions from a fixed script, like ["call", "check", ("bet", 10), "fold"]
+        Args:
+            script (list): action names, or tuples ("bet", chips)
+            repeat (bool): start the script over when it runs out, instead of raising ScriptExhaustedException
+        """
+        self.script = script
+        self.repeat = repeat
+        self.position = 0
+
+    def act(self, game):
+        if self.position >= len(self.script):
+            if not self.repeat:
+                raise ScriptExhaustedException()
+            self.position = 0
+        action = self.script[self.position]
+        self.position += 1
+        if isinstance(action, tuple):
+            action, chips = action
+            getattr(game, action)(chips)
+        else:
+            getattr(game, action)()
+        return action
+
+def timed_engine(engine, timings):
+    """_summary_
+    Subclass the engine's PokerGame so every method in TIMED_METHODS adds its call count and
+    Elapsed time to timings. PokerGame uses __slots__, so methods cannot be wrapped per instance
+    Args:
+        engine (module): module containing PokerGame
+        timings (dict): method name -> [calls, seconds], filled in as the game runs
+
+    Returns:
+        class: the timed subclass of PokerGame
+    """
+    def wrap(name, method):
+        record = timings.setdefault(name, [0, 0.0])
+        def timed(self, *args):
+            start = time.perf_counter()
+            try:
+                return method(self, *args)
+            finally:
+                record[0] += 1
+                record[1] += time.perf_counter() - start
+        return timed
+    methods = {name: wrap(name, getattr(engine.PokerGame, name)) for name in TIMED_METHODS if hasattr(engine.PokerGame, name)}
+    return type("TimedPokerGame", (engine.PokerGame,), methods)
+
+def table_chips(game):
+    return sum(game.stacks)
+
+def simulate(tables=8, hands=1000, players=6, stack=200, seed=0, policy=None, engine_path=ENGINE_PATH, timed=True, seeded=True):
+    """_summary_
+    Play hands on several tables, interleaving the tables hand by hand as a server would
+    Args:
+        tables (int): number of tables
+        hands (int): hands to play on each table
+        players (int): players seated at each table
+        stack (int): starting stack, restored whenever a player busts
+        seed (int): seed for dealing and for the default RandomPolicy
+        policy (object): policy with act(game), defaults to RandomPolicy(seed)
+        engine_path (string): path of the PokerGame module to simulate
+        timed (bool): measure time spent in each method, at some cost to throughput
+        seeded (bool): deal from seeded shuffles so a run can be reproduced, instead of the secure entropy pool
+
+    Returns:
+        dict: hands, actions, elapsed seconds, per-action counts and per-method [calls, seconds]
+    """
+    random.seed(seed)
+    policy = policy or RandomPolicy(seed)
+    engine = load_engine(engine_path)
+    timings = {}
+    if timed:
+        engine.PokerGame = timed_engine(engine, timings)
+    games = [new_game(engine, players, stack, seed * tables + table if seeded else None) for table in range(tables)]
+    totals = [table_chips(game) for game in games]
+    action_counts = {action: 0 for action in ACTIONS}
+
+    start = time.perf_counter()
+    for hand in range(hands):
+        for table, game in enumerate(games):
+            if len(game.active_seats) < players:
+                reset_stacks(game, stack)
+                totals[table] = table_chips(game)
+            game.deal()
+            action_counts["deal"] += 1
+            while game.hand_running():
+                action_counts[policy.act(game)] += 1
+            if table_chips(game) != totals[table]:
+                raise ChipConservationException(f"Table {table} hand {hand}: {table_chips(game)} chips, expected {totals[table]}")
+    elapsed = time.perf_counter() - start
+    return {
+        "hands": hands * tables,
+        "actions": sum(action_counts.values()) - action_counts["deal"],
+        "elapsed": elapsed,
+        "action counts": action_counts,
+        "timings": timings
+    }
+
+def combine_results(results):
+    """_summary_
+    Combine the results of simulate from several processes
+    Elapsed time is the slowest process, since the processes ran side by side
+    """
+    combined = {"hands": 0, "actions": 0, "elapsed": 0, "action counts": {}, "timings": {}}
+    for result in results:
+        combined["hands"] += result["hands"]
+        combined["actions"] += result["actions"]
+        combined["elapsed"] = max(combined["elapsed"], result["elapsed"])
+        for action, count in result["action counts"].items():
+            combined["action counts"][action] = combined["action counts"].get(action, 0) + count
+        for name, (calls, seconds) in result["timings"].items():
+            record = combined["timings"].setdefault(name, [0, 0.0])
+            record[0] += calls
+            record[1] += seconds
+    return combined
+
+def run_simulation(processes=None, tables=8, hands=1000, seed=0, **options):
+    """_summary_
+    Fan simulate out across processes, each playing its own tables with its own seed
+    Args:
+        processes (int): number of worker processes, defaults to the number of cores
+        tables (int): tables per process
+        hands (int): hands per table
+        seed (int): base seed, process i uses seed + i
+
+    Returns:
+        dict: combined results, see simulate
+    """
+    processes = processes or os.cpu_count()
+    if processes == 1:
+        return simulate(tables, hands, seed=seed, **options)
+    with ProcessPoolExecutor(processes) as executor:
+        futures = [executor.submit(simulate, tables, hands, seed=seed + ind, **options) for ind in range(processes)]
+        return combine_results([future.result() for future in futures])
+
+def print_report(results):
+    elapsed = results["elapsed"]
+    print(f"{results['hands']:,} hands, {results['actions']:,} actions in {elapsed:.2f} seconds")
+    print(f"    hands/sec: {results['hands'] / elapsed:,.0f}")
+    print(f"    actions/sec: {results['actions'] / elapsed:,.0f}")
+    print("    actions: " + ", ".join(f"{action} {count:,}" for action, count in results["action counts"].items()))
+    if results["timings"]:
+        print("    method          calls      total s    us/call")
+        for name, (calls, seconds) in sorted(results["timings"].items(), key=lambda item: -item[1][1]):
+            per_call = seconds / calls * 1e6 if calls else 0
+            print(f"    {name:<14}{calls:>8,}{seconds:>12.3f}{per_call:>11.2f}")
+
+if __name__ == '__main__':
+    tables = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    hands = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    processes = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    engine_path = sys.argv[4] if len(sys.argv) > 4 else ENGINE_PATH
+    print_report(run_simulation(processes, tables, hands, engine_path=engine_path))
@@ -0,0 +1,151 @@
+import os
+import pickle
+import time
+from PokerTable import PokerTable
+
+"""
+Snapshots of running tables, so a restart or crash resumes every table instead of dropping
+The chips on it. Each table is saved to its own file, <channel id>.snap, holding the pickled
+Builtin types returned by PokerTable.snapshot. Files are replaced atomically, so a crash while
+Saving leaves the previous snapshot in place.
+
+Tables left idle between hands are hibernated: saved, then evicted from PokerTable.running,
+Until the next command in their channel rehydrates them from their snapshot. An empty
+<channel id>.hibernated file marks them, so they stay hibernated across restarts.
+"""
+
+class SnapshotStore:
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        # Channel ID -> bytes last written, so unchanged tables are not written again
+        self.written = {}
+        # Channel IDs of tables saved here and evicted from memory
+        self.hibernated = set()
+
+    def path(self, channelID):
+        return os.path.join(self.directory, f"{channelID}.snap")
+
+    def marker_path(self, channelID):
+        return os.path.join(self.directory, f"{channelID}.hibernated")
+
+    def remove_marker(self, channelID):
+        if os.path.exists(self.marker_path(channelID)):
+            os.remove(self.marker_path(channelID))
+
+    def save(self, table, force=False):
+        """_summary_
+        Save a table if it has changed since it was last saved
+        Args:
+            table (PokerTable): table to save
+            force (bool): save even if the table has not changed
+
+        Returns:
+            bool: whether the table was written
+        """
+        data = pickle.dumps(table.snapshot(), protocol=pickle.HIGHEST_PROTOCOL)
+        if not force and self.written.get(table.channelID) == data:
+            return False
+        path = self.path(table.channelID)
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as file:
+            file.write(data)
+        os.replace(temporary, path)
+        self.written[table.channelID] = data
+        return True
+
+    def save_all(self, tables, force=False):
+        """_summary_
+        Save every table which has changed
+        Returns:
+            int: number of tables written
+        """
+        return sum(self.save(table, force) for table in tables)
+
+    def delete(self, channelID):
+        self.written.pop(channelID, None)
+        self.hibernated.discard(channelID)
+        self.remove_marker(channelID)
+        if os.path.exists(self.path(channelID)):
+            os.remove(self.path(channelID))
+
+    def load_all(self):
+        """_summary_
+        Read every saved table which was not hibernated, and add the hibernated ones to hibernated without reading them
+        Returns:
+            list: table snapshots, see PokerTable.snapshot
+        """
+        snapshots = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".snap"):
+                continue
+            channelID = int(name[:-len(".snap")])
+            if os.path.exists(self.marker_path(channelID)):
+                self.hibernated.add(channelID)
+                continue
+            with open(os.path.join(self.directory, name), "rb") as file:
+                data = file.read()
+            snapshot = pickle.loads(data)
+            # The file already holds this state, so it need not be written again until it changes
+            self.written[snapshot[1]] = data
+            snapshots.append(snapshot)
+        return snapshots
+
+    def hibernate(self, table):
+        """_summary_
+        Save a table and evict it from memory, along with its last written bytes
+        """
+        self.save(table)
+        open(self.marker_path(table.channelID), "wb").close()
+        table.game.history.close()
+        del PokerTable.running[table.channelID]
+        self.written.pop(table.channelID, None)
+        self.hibernated.add(table.channelID)
+
+    def hibernate_idle(self, idle_seconds):
+        """_summary_
+        Hibernate every table with no hand running which has been idle for idle_seconds
+        Returns:
+            int: number of tables hibernated
+        """
+        now = time.monotonic()
+        idle = [table for table in PokerTable.running.values()
+                if not table.game.hand_running() and now - table.last_active >= idle_seconds]
+        for table in idle:
+            self.hibernate(table)
+        return len(idle)
+
+    def rehydrate(self, channelID, data_manager):
+        """_summary_
+        Bring a hibernated table back into PokerTable.running
+        Returns:
+            PokerTable: the table, or None if no table is hibernated in the channel
+        """
+        if channelID not in self.hibernated:
+            return None
+        with open(self.path(channelID), "rb") as file:
+            data = file.read()
+        table = PokerTable.restore(pickle.loads(data), data_manager)
+        self.written[channelID] = data
+        self.hibernated.discard(channelID)
+        self.remove_marker(channelID)
+        return table
+
+    def table_counts(self):
+        """_summary_
+        Returns:
+            tuple(int, int): number of resident tables and hibernated tables
+        """
+        return len(PokerTable.running), len(self.hibernated)
+
+def restore_tables(store, data_manager):
+    """_summary_
+    Reopen every table saved in store, leaving hibernated tables hibernated until a command rehydrates them
+    Returns:
+        tuple(int, float): number of tables restored and seconds taken
+    """
+    start = time.perf_counter()
+    snapshots = store.load_all()
+    for snapshot in snapshots:
+        PokerTable.restore(snapshot, data_manager)
+    return len(snapshots), time.perf_counter() - start
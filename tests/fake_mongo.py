@@ -0,0 +1,154 @@
+import copy
+import itertools
+import threading
+from collections import Counter
+from types import SimpleNamespace
+
+from pymongo import ReturnDocument
+
+from DataManager import DataManager, PlayerCache
+
+class FakeCollection:
+    """
+    In-memory stand-in for a pymongo collection, with just the queries and updates DataManager sends
+    Each method call is one command, so calls counts the round trips a real collection would make
+    """
+    def __init__(self, name="fake"):
+        self.name = name
+        self.documents = []
+        self.calls = Counter()
+        self.lock = threading.Lock()
+        self.ids = itertools.count()
+
+    def round_trips(self):
+        return sum(self.calls.values())
+
+    def matches(self, document, query):
+        for field, condition in query.items():
+            value = document.get(field)
+            if isinstance(condition, dict):
+                for operator, operand in condition.items():
+                    if value is None:
+                        return False
+                    if operator == "$gte" and not value >= operand:
+                        return False
+                    if operator == "$lt" and not value < operand:
+                        return False
+            elif value != condition:
+                return False
+        return True
+
+    def evaluate(self, document, expression):
+        if isinstance(expression, str) and expression.startswith("$"):
+            return document.get(expression[1:])
+        if not isinstance(expression, dict):
+            return expression
+        (operator, operands), = expression.items()
+        values = [self.evaluate(document, operand) for operand in operands]
+        match operator:
+            case "$ifNull":
+                return values[0] if values[0] is not None else values[1]
+            case "$add":
+                return sum(values)
+            case "$subtract":
+                return values[0] - values[1]
+            case "$max":
+                return max(values)
+            case "$lte":
+                return values[0] <= values[1]
+            case "$cond":
+                return values[1] if values[0] else values[2]
+        raise NotImplementedError(operator)
+
+    def apply(self, document, update, inserted):
+        if isinstance(update, list):
+            for stage in update:
+                fields = {field: self.evaluate(document, expression) for field, expression in stage["$set"].items()}
+                document.update(fields)
+            return
+        for operator, fields in update.items():
+            for field, value in fields.items():
+                match operator:
+                    case "$set":
+                        document[field] = value
+                    case "$setOnInsert":
+                        if inserted:
+                            document[field] = value
+                    case "$inc":
+                        document[field] = document.get(field, 0) + value
+                    case "$addToSet":
+                        if value not in document.setdefault(field, []):
+                            document[field].append(value)
+                    case _:
+                        raise NotImplementedError(operator)
+
+    def project(self, document, projection):
+        if document is None or projection is None:
+            return copy.deepcopy(document)
+        fields = {field for field, include in projection.items() if include}
+        if projection.get("_id", 1):
+            fields.add("_id")
+        return {field: copy.deepcopy(value) for field, value in document.items() if field in fields}
+
+    def upsert(self, query, update, upsert):
+        # Returns the matched or inserted document, a copy of it before the update, and whether it was inserted
+        for document in self.documents:
+            if self.matches(document, query):
+                before = copy.deepcopy(document)
+                self.apply(document, update, False)
+                return document, before, False
+        if not upsert:
+            return None, None, False
+        document = {field: value for field, value in query.items() if not isinstance(value, dict)}
+        document.setdefault("_id", next(self.ids))
+        self.documents.append(document)
+        self.apply(document, update, True)
+        return document, None, True
+
+    def find_one(self, query, projection=None):
+        with self.lock:
+            self.calls["find_one"] += 1
+            document = next((document for document in self.documents if self.matches(document, query)), None)
+            return self.project(document, projection)
+
+    def find_one_and_update(self, query, update, projection=None, upsert=False, return_document=ReturnDocument.BEFORE):
+        with self.lock:
+            self.calls["find_one_and_update"] += 1
+            document, before, inserted = self.upsert(query, update, upsert)
+            return self.project(document if return_document == ReturnDocument.AFTER else before, projection)
+
+    def update_one(self, query, update, upsert=False):
+        with self.lock:
+            self.calls["update_one"] += 1
+            document, before, inserted = self.upsert(query, update, upsert)
+            return SimpleNamespace(matched_count=int(document is not None and not inserted), upserted_id=document["_id"] if inserted else None)
+
+    def delete_one(self, query):
+        with self.lock:
+            self.calls["delete_one"] += 1
+            for ind, document in enumerate(self.documents):
+                if self.matches(document, query):
+                    del self.documents[ind]
+                    return
+
+    def count_documents(self, query, limit=0):
+        with self.lock:
+            self.calls["count_documents"] += 1
+            count = sum(1 for document in self.documents if self.matches(document, query))
+            return min(count, limit) if limit else count
+
+def offline_manager():
+    """
+    DataManager whose collections are FakeCollections, built without connecting to the cluster
+    """
+    manager = DataManager.__new__(DataManager)
+    manager.pool_size = 1
+    manager.player_data = FakeCollection("PlayerData")
+    manager.channel_data = FakeCollection("Channels")
+    manager.player_stats = FakeCollection("PlayerStats")
+    manager.table_data = FakeCollection("Tables")
+    manager.player_cache = PlayerCache()
+    manager.enabled_channels = set()
+    manager.channels_loaded = None
+    manager.channels_lock = threading.Lock()
+    return manager
@@ -0,0 +1,50 @@
+import types
+
+import pytest
+
+from Benchmark import acting_seat, make_game, new_game
+
+class BaselinePokerGame:
+    """
+    Shaped like the engine from before configurable seats and seeded shuffling: the constructor takes nothing
+    """
+    def __init__(self):
+        self.seats = 6
+        self.stacks = [0] * self.seats
+        self.active_seats = set()
+
+    def buyin(self, seat, stack):
+        self.stacks[seat] = stack
+
+    def sitin(self, seat):
+        self.active_seats.add(seat)
+
+class SeatedPokerGame(BaselinePokerGame):
+    def __init__(self, seats=6, seed=None):
+        self.seats = seats
+        self.stacks = [0] * seats
+        self.active_seats = set()
+        self.seed = seed
+
+baseline = types.SimpleNamespace(PokerGame=BaselinePokerGame)
+seated = types.SimpleNamespace(PokerGame=SeatedPokerGame)
+
+def test_new_game_on_baseline_engine():
+    game = new_game(baseline, 4, 200, seed=1)
+    assert game.seats == 6
+    assert game.stacks[:4] == [200] * 4
+    assert game.active_seats == {0, 1, 2, 3}
+
+def test_make_game_rejects_more_seats_than_baseline_has():
+    with pytest.raises(ValueError):
+        make_game(baseline, 9)
+
+def test_make_game_passes_seats_and_seed():
+    game = new_game(seated, 9, 200, seed=3)
+    assert game.seats == 9
+    assert game.seed == 3
+
+def test_acting_seat_on_baseline_engine():
+    game = new_game(baseline, 3, 200)
+    game.action_permissions = [2, 0, 1]
+    assert acting_seat(game) == 2
@@ -0,0 +1,73 @@
+import threading
+
+from DataManager import MAX_TABLES
+from fake_mongo import offline_manager
+
+def round_trips(manager, operation):
+    collection = manager.player_data
+    before = collection.round_trips()
+    result = operation()
+    return result, collection.round_trips() - before
+
+def test_balance_operations_make_one_round_trip():
+    manager = offline_manager()
+    userID = 1
+    operations = {
+        "get_chips": lambda: manager.get_chips(userID),
+        "get_chips, fresh": lambda: manager.get_chips(userID, fresh=True),
+        "add_chips": lambda: manager.add_chips(userID, 300),
+        "remove_chips": lambda: manager.remove_chips(userID, 100),
+        "remove_chips, too few": lambda: manager.remove_chips(userID, 10 ** 9),
+        "take_chips": lambda: manager.take_chips(userID, 50),
+        "take_chips, too few": lambda: manager.take_chips(userID, 10 ** 9),
+        "set_chips": lambda: manager.set_chips(userID, 500),
+        "generate_chips": lambda: manager.generate_chips(userID),
+        "generate_chips, cooling down": lambda: manager.generate_chips(userID),
+    }
+    counts = {name: round_trips(manager, operation)[1] for name, operation in operations.items()}
+    assert counts == {name: 1 for name in operations}
+
+def test_cached_balance_makes_no_round_trip():
+    manager = offline_manager()
+    manager.add_chips(1, 300)
+    assert round_trips(manager, lambda: manager.get_chips(1)) == (300, 0)
+
+def test_take_chips_only_takes_a_covered_amount():
+    manager = offline_manager()
+    manager.set_chips(1, 100)
+    assert manager.take_chips(1, 150) is None
+    assert manager.get_chips(1, fresh=True) == 100
+    assert manager.take_chips(1, 60) == 60
+    assert manager.get_chips(1) == 40
+    assert manager.get_chips(1, fresh=True) == 40
+
+def test_create_table_stops_at_max_tables():
+    manager = offline_manager()
+    for ind in range(MAX_TABLES):
+        assert manager.create_table(1, f"table{ind}", {})
+    assert not manager.create_table(1, "one too many", {})
+    assert manager.table_data.count_documents({"owner": 1}) == MAX_TABLES
+    # Changing an existing table's options is not a new table
+    assert manager.create_table(1, "TABLE0", {"sb": 5})
+    assert manager.get_table(1, "table0") == {"sb": 5}
+
+def test_racing_creates_never_pass_max_tables():
+    manager = offline_manager()
+    for ind in range(MAX_TABLES - 1):
+        manager.create_table(1, f"table{ind}", {})
+    # Both creates insert their table before either counts
+    barrier = threading.Barrier(2)
+    count_documents = manager.table_data.count_documents
+    def counted_after_both_inserts(*args, **kwargs):
+        barrier.wait()
+        return count_documents(*args, **kwargs)
+    manager.table_data.count_documents = counted_after_both_inserts
+    results = []
+    threads = [threading.Thread(target=lambda name=name: results.append(manager.create_table(1, name, {}))) for name in ("first", "second")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    manager.table_data.count_documents = count_documents
+    assert results.count(True) <= 1
+    assert manager.table_data.count_documents({"owner": 1}) <= MAX_TABLES
@@ -0,0 +1,23 @@
+from Events import PlayerBusted
+from PokerGame import PokerGame
+
+def play_out(game):
+    while game.hand_running():
+        if game.may_check():
+            game.check()
+        else:
+            game.call()
+
+def test_emptied_seat_is_not_busted():
+    game = PokerGame(6, seed=3)
+    events = []
+    game.subscribe(events.append)
+    for seat in range(3):
+        game.buyin(seat, 100)
+        game.sitin(seat)
+    game.deal()
+    seat = game.acting_seat
+    game.fold()
+    game.cashout(seat)
+    play_out(game)
+    assert [event for event in events if isinstance(event, PlayerBusted)] == []
@@ -0,0 +1,48 @@
+import os
+import struct
+
+from HandHistory import (BB, END, FINAL, HAND, HEADER, MAGIC, NO_SEAT, SB, STACK, VERSION, HandHistoryReader, HandLog,
+                         decode_hand, history_files, read_header)
+from PokerGame import PokerGame
+from Replay import replay_file
+
+BIG_STACK = 2 ** 33 + 7
+
+def test_stacks_past_32_bits_are_recorded_and_replayed(tmp_path):
+    game = PokerGame(6, seed=2)
+    game.history = HandLog(str(tmp_path), 5, game.seats)
+    game.sb = 2 ** 31
+    game.bb = 2 ** 32
+    for seat in range(3):
+        game.buyin(seat, BIG_STACK + seat)
+        game.sitin(seat)
+    game.deal()
+    while game.hand_running():
+        if game.may_check():
+            game.check()
+        else:
+            game.call()
+    game.history.close()
+    path, = history_files(str(tmp_path), 5)
+    hand = decode_hand(next(HandHistoryReader(str(tmp_path), 5).hands()))
+    assert hand["bb"] == 2 ** 32
+    assert hand["stacks"] == {seat: BIG_STACK + seat for seat in range(3)}
+    assert hand["final"] == {seat: game.stacks[seat] for seat in range(3)}
+    assert replay_file(path) == (1, [])
+
+def test_version_1_files_are_read_and_not_appended_to(tmp_path):
+    record = struct.Struct("<BBI")
+    path = os.path.join(str(tmp_path), "5-000000.hh")
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, 1, 6, 0, 5))
+        for kind, seat, value in ((HAND, 0, 1700000000), (SB, NO_SEAT, 1), (BB, NO_SEAT, 2), (STACK, 0, 200), (FINAL, 0, 201), (END, 0, 0)):
+            file.write(record.pack(kind, seat, value))
+    hand = decode_hand(next(HandHistoryReader(str(tmp_path), 5).hands()))
+    assert hand["time"] == 1700000000
+    assert hand["stacks"] == {0: 200}
+    assert hand["final"] == {0: 201}
+    HandLog(str(tmp_path), 5, 6).close()
+    first, second = history_files(str(tmp_path), 5)
+    assert read_header(first) == (6, 5, 0)
+    with open(second, "rb") as file:
+        assert HEADER.unpack(file.read(HEADER.size))[1] == VERSION
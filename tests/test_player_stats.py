@@ -0,0 +1,31 @@
+from PlayerStats import NET, PlayerStats, StatsRecorder
+from PokerGame import PokerGame
+
+def play_out(game):
+    while game.hand_running():
+        if game.may_check():
+            game.check()
+        else:
+            game.call()
+
+def test_player_who_leaves_mid_hand_is_charged_for_their_own_hand():
+    game = PokerGame(6, seed=3)
+    players = [10, 11, 12, None, None, None]
+    stats = PlayerStats()
+    game.history = StatsRecorder(players, stats)
+    for seat in range(3):
+        game.buyin(seat, 100)
+        game.sitin(seat)
+    game.deal()
+    # The first player to act folds, cashes out and is replaced before the hand ends
+    seat = game.acting_seat
+    leaver = players[seat]
+    game.fold()
+    invested = game.chips_invested[seat] + game.current_bets[seat]
+    game.cashout(seat)
+    players[seat] = 20
+    game.buyin(seat, 500)
+    play_out(game)
+    assert 20 not in stats.pending
+    assert stats.pending[leaver][NET] == -invested
+    assert sum(counts[NET] for counts in stats.pending.values()) == 0
@@ -0,0 +1,27 @@
+import pytest
+
+from PokerGame import cards
+from PreflopTable import HEADER, PreflopTable, build_table
+
+@pytest.fixture(scope="module")
+def table_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("preflop") / "preflop_equity.bin")
+    build_table(path, boards=100, processes=2)
+    return path
+
+def test_matchup_lookup(table_path):
+    table = PreflopTable(table_path)
+    win, tie, equity = table.matchup(cards("AsAh"), cards("KdKc"))
+    assert 0.7 < equity < 0.95
+    assert equity == pytest.approx(win + tie / 2)
+    assert table.matchup(cards("KdKc"), cards("AsAh"))[2] < 0.3
+
+def test_version_1_class_table_is_skipped(table_path, tmp_path):
+    with open(table_path, "rb") as file:
+        data = file.read()
+    magic, version, boards, matchups = HEADER.unpack_from(data)
+    path = str(tmp_path / "version1.bin")
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(magic, 1, boards, matchups) + bytes(169 * 169 * 2) + data[HEADER.size:])
+    hands = cards("AsAh"), cards("KdKc")
+    assert PreflopTable(path).matchup(*hands) == PreflopTable(table_path).matchup(*hands)
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from Equity import combine_tallies, range_tally
+from PokerGame import InvalidRangeException, class_combos, parse_range, range_classes
+
+def test_zero_weight_hands_are_dropped():
+    hands = parse_range("AA:0, KK")
+    high, low, kind = range_classes("KK")[0]
+    assert set(hands) == set(class_combos(high, low, kind))
+
+def test_zero_weight_overrides_earlier_term():
+    hands = parse_range("QQ+, AsAh:0")
+    assert len(hands) == 17
+    assert all(weight == 1 for weight in hands.values())
+
+def test_range_of_only_zero_weights_is_invalid():
+    with pytest.raises(InvalidRangeException):
+        parse_range("AA:0")
+
+def test_zero_weight_range_tallies():
+    ranges = [parse_range("AA:0, KK"), parse_range("QQ")]
+    tally = range_tally(ranges, [], 2000, seed=1)
+    results = combine_tallies([tally])
+    assert all(np.isfinite(share) for win, tie, share in results)
+    assert results[0][2] > results[1][2]
@@ -0,0 +1,43 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import PokerTable as table_module
+from DataManager import default_table_options
+from PokerTable import PokerTable
+
+def allin_runout(variant):
+    options = default_table_options()
+    options["game"] = variant
+    table = PokerTable("runout", 1, 10, options, None)
+    game = table.game
+    for seat, userID in enumerate((10, 11)):
+        game.buyin(seat, game.bb * 3)
+        game.sitin(seat)
+        table.players[seat] = userID
+    game.deal()
+    while game.hand_running():
+        legal_actions = game.legal_actions()
+        if game.may_bet() and legal_actions.max_bet > game.current_bet:
+            game.bet(legal_actions.max_bet)
+        elif game.may_check():
+            game.check()
+        else:
+            game.call()
+    with ThreadPoolExecutor() as executor:
+        asyncio.run(table.calculate_runout_equity(executor))
+    return table
+
+@pytest.mark.parametrize("variant", ["holdem", "plo"])
+def test_runout_equity_of_every_street(tmp_path, monkeypatch, variant):
+    monkeypatch.setattr(table_module, "HISTORY_DIRECTORY", str(tmp_path))
+    table = allin_runout(variant)
+    assert len(table.runout_equity) == len(table.game.runout_boards) > 0
+    for board, equities in table.runout_equity:
+        assert set(equities) == {0, 1}
+        assert sum(equity for win, tie, equity in equities.values()) == pytest.approx(1)
+
+def test_short_deck_has_no_runout_equity(tmp_path, monkeypatch):
+    monkeypatch.setattr(table_module, "HISTORY_DIRECTORY", str(tmp_path))
+    assert allin_runout("shortdeck").runout_equity == []